@@ -0,0 +1,92 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.shortcuts import render
+
+from .build import BuildContext
+from .catalog import CATEGORY_MODELS, catalog
+from .columnar import acandidate_ids
+from .compatibility import CANDIDATE_DEPENDS_ON, filter_compatible_candidates_qs
+from .conditional import catalog_conditional
+from .records import component_records
+from .pagination import InvalidCursor, akeyset_page_from_request, page_size_from_request
+from .search import acached_search
+from .views import _category_list_context, _detail_context, _search_response
+
+# Used instead of the matching views in views.py when served over ASGI (see
+# pc_builder/asgi.py and main/urls.py). Templates are rendered in a worker
+# thread because the auth context processor loads request.user synchronously.
+arender = sync_to_async(render)
+
+
+@catalog_conditional(uses_build=True)
+async def list_components(request, category):
+    compatibility_on = await request.session.aget("compatibility_on", True)
+
+    build = await BuildContext.afor_request(request)
+
+    model_class = CATEGORY_MODELS.get(category)
+    if not model_class:
+        return HttpResponseBadRequest("Некорректная категория")
+
+    items = component_records(model_class.objects.all(), category)
+
+    ids = None
+    if compatibility_on:
+        if category in CANDIDATE_DEPENDS_ON:
+            # Load the selected slots before the sync filter below reads them; cached on the request.
+            await build.aload()
+        items = filter_compatible_candidates_qs(category, items, build)
+        ids = await acandidate_ids(category, build)
+
+    try:
+        items, next_cursor = await akeyset_page_from_request(request, items, ids)
+    except InvalidCursor:
+        return HttpResponseBadRequest("Некорректный курсор")
+
+    context = _category_list_context(request, category, items, compatibility_on, next_cursor, build)
+    return await arender(request, "main/category_list.html", context)
+
+
+@catalog_conditional()
+async def component_detail(request, category, item_id):
+    if category not in CATEGORY_MODELS:
+        return HttpResponseBadRequest("Некорректная категория")
+
+    obj = await catalog.aget(category, item_id)
+    if not obj:
+        return HttpResponseBadRequest("Объект не найден")
+
+    return await arender(request, "main/detail.html", _detail_context(category, obj))
+
+
+@login_required
+async def ajax_search(request, category):
+    compatibility_on = await request.session.aget("compatibility_on", True)
+    query = request.GET.get("q", "").strip().lower()
+
+    build = await BuildContext.afor_request(request)
+
+    model_class = CATEGORY_MODELS.get(category)
+    if not model_class:
+        return JsonResponse({"error": "Некорректная категория"}, status=400)
+
+    if query:
+        # One capped page, never paginated; see views.ajax_search.
+        items = await acached_search(category, query, page_size_from_request(request), compatibility_on, build)
+        next_cursor = None
+    else:
+        items = component_records(model_class.objects.all(), category)
+        ids = None
+        if compatibility_on:
+            if category in CANDIDATE_DEPENDS_ON:
+                # Load the selected slots before the sync filter below reads them; cached on the request.
+                await build.aload()
+            items = filter_compatible_candidates_qs(category, items, build)
+            ids = await acandidate_ids(category, build)
+        try:
+            items, next_cursor = await akeyset_page_from_request(request, items, ids)
+        except InvalidCursor:
+            return JsonResponse({"error": "Некорректный курсор"}, status=400)
+
+    return _search_response(request, category, items, next_cursor)
@@ -0,0 +1,186 @@
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from accounts.models import SavedBuild
+from .build import BUILD_MAP
+from .catalog import CATEGORY_MODELS, bump_catalog_version, catalog
+from .fragments import evict_fragments
+from .compatibility import (
+    filter_compatible_motherboards,
+    filter_compatible_motherboard_ids,
+    filter_compatible_motherboards_qs,
+    filter_compatible_cases_by_motherboard,
+    filter_compatible_case_ids,
+    filter_compatible_cases_by_motherboard_qs,
+    filter_compatible_psu,
+    filter_compatible_psu_qs,
+    filter_compatible_memory_for_build,
+)
+from .models import Cpu, Motherboard, Memory, Os, VideoCard, InternalHardDrive, PowerSupply, Case
+from .report import report_cache
+from .search import get_backend
+from .specs import SPEC_MAP, refresh_specs
+from .synthetic import clear_catalog, ensure_catalog_tables, generate_catalog
+
+SAVED_BUILDS = 50
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        yield counter
+
+
+def measure(func, repeat):
+    func()  # warm-up: fills per-worker caches the same way production does
+
+    timings = []
+    with count_queries() as counter:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "wall_ms": round(statistics.median(timings) * 1000, 3),
+        "min_ms": round(min(timings) * 1000, 3),
+        "queries": counter.count // repeat,
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def best_of(repeat, func):
+    """Fastest of ``repeat`` runs in seconds, and the last run's result."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def reset_catalog():
+    SavedBuild.objects.all().delete()
+    clear_catalog()
+    catalog.invalidate()
+    get_backend().reset()
+    evict_fragments()
+    report_cache().clear()
+
+
+def load_catalog(rows, seed=0):
+    ensure_catalog_tables()
+    reset_catalog()
+    generate_catalog(rows, seed=seed)
+    for category in SPEC_MAP:
+        refresh_specs(category)
+    bump_catalog_version()
+
+
+def _logged_in_client():
+    user, _ = User.objects.get_or_create(username="bench")
+    client = Client()
+    client.force_login(user)
+
+    session = client.session
+    for session_key, _ in BUILD_MAP.items():
+        session[session_key] = 1
+    session.save()
+
+    SavedBuild.objects.bulk_create([
+        SavedBuild(
+            user=user,
+            build_name=f"Bench {i}",
+            **{cat: CATEGORY_MODELS[cat].objects.get(id=1) for cat in ("cpu", "motherboard", "memory", "case", "powersupply")},
+        )
+        for i in range(SAVED_BUILDS)
+    ])
+    return client
+
+
+def _get(client, url, **params):
+    response = client.get(url, params)
+    if response.status_code != 200:
+        raise RuntimeError(f"{url}: HTTP {response.status_code}")
+    return response
+
+
+def benchmarks(client):
+    cpu = Cpu.objects.get(id=1)
+    motherboard = Motherboard.objects.get(id=1)
+    memory = Memory.objects.get(id=1)
+    os_ = Os.objects.get(id=1)
+    gpu = VideoCard.objects.get(id=1)
+    hdd = InternalHardDrive.objects.get(id=1)
+
+    return {
+        "filter_compatible_motherboards": lambda: filter_compatible_motherboards(
+            cpu, Motherboard.objects.all()),
+        "filter_compatible_motherboards_qs": lambda: list(filter_compatible_motherboards_qs(
+            cpu, Motherboard.objects.all())),
+        "filter_compatible_motherboard_ids[index]": lambda: filter_compatible_motherboard_ids(
+            catalog.socket_index(), cpu),
+        "filter_compatible_cases_by_motherboard": lambda: filter_compatible_cases_by_motherboard(
+            motherboard, Case.objects.all()),
+        "filter_compatible_cases_by_motherboard_qs": lambda: list(filter_compatible_cases_by_motherboard_qs(
+            motherboard, Case.objects.all())),
+        "filter_compatible_case_ids[index]": lambda: filter_compatible_case_ids(
+            catalog.form_factor_index(), motherboard),
+        "filter_compatible_psu": lambda: filter_compatible_psu(
+            PowerSupply.objects.all(), cpu=cpu, gpu=gpu, memory=memory, hdd=hdd),
+        "filter_compatible_psu_qs": lambda: list(filter_compatible_psu_qs(
+            PowerSupply.objects.all(), cpu=cpu, gpu=gpu, memory=memory, hdd=hdd)),
+        "filter_compatible_memory_for_build": lambda: filter_compatible_memory_for_build(
+            Memory.objects.all(), cpu=cpu, motherboard=motherboard, os_=os_),
+        "view:list_components[motherboard]": lambda: _get(
+            client, reverse("main:list_components", args=["motherboard"])),
+        "view:list_components[powersupply]": lambda: _get(
+            client, reverse("main:list_components", args=["powersupply"])),
+        "view:ajax_search[memory]": lambda: _get(
+            client, reverse("main:ajax_search", args=["memory"])),
+        "view:ajax_search[memory,q=kingston]": lambda: _get(
+            client, reverse("main:ajax_search", args=["memory"]), q="kingston"),
+        "view:show_build": lambda: _get(client, reverse("main:show_build")),
+        "view:my_builds": lambda: _get(client, reverse("main:my_builds")),
+    }
+
+
+def run_suite(sizes, repeat=3, seed=0, only=None, log=print):
+    results = []
+    for rows in sizes:
+        log(f"loading {rows} rows per category...")
+        load_catalog(rows, seed=seed)
+        client = _logged_in_client()
+        for name, func in benchmarks(client).items():
+            if only and only not in name:
+                continue
+            result = {"name": name, "rows": rows, **measure(func, repeat)}
+            log(f"  {name:45} {result['wall_ms']:10.3f} ms {result['queries']:4} q {result['peak_kib']:10.1f} KiB")
+            results.append(result)
+    return results
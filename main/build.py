@@ -0,0 +1,113 @@
+import asyncio
+
+from .models import (
+    Cpu,
+    Motherboard,
+    Memory,
+    Case,
+    CpuCooler,
+    InternalHardDrive,
+    Os,
+    VideoCard,
+    PowerSupply,
+)
+
+BUILD_MAP = {
+    "build_cpu": (Cpu, "cpu"),
+    "build_motherboard": (Motherboard, "motherboard"),
+    "build_memory": (Memory, "memory"),
+    "build_case": (Case, "case"),
+    "build_cpu_cooler": (CpuCooler, "cpu_cooler"),
+    "build_hdd": (InternalHardDrive, "hdd"),
+    "build_os": (Os, "os"),
+    "build_video_card": (VideoCard, "video_card"),
+    "build_powersupply": (PowerSupply, "powersupply"),
+}
+
+BUILD_CATEGORIES = tuple(cat for _, cat in BUILD_MAP.values())
+
+
+def _session_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class BuildContext:
+    """The components selected in the session, fetched in one batched pass."""
+
+    def __init__(self, session):
+        self.ids = {}
+        for session_key, (_, cat_name) in BUILD_MAP.items():
+            item_id = _session_id(session.get(session_key))
+            if item_id:
+                self.ids[cat_name] = item_id
+        self._components = None
+
+    @classmethod
+    def for_request(cls, request):
+        build = getattr(request, "_build_context", None)
+        if build is None:
+            build = cls(request.session)
+            request._build_context = build
+        return build
+
+    @classmethod
+    async def afor_request(cls, request):
+        build = getattr(request, "_build_context", None)
+        if build is None:
+            session = request.session
+            build = cls({key: await session.aget(key) for key in BUILD_MAP})
+            request._build_context = build
+        return build
+
+    @classmethod
+    def invalidate(cls, request):
+        request.__dict__.pop("_build_context", None)
+
+    def _lookups(self):
+        for model_class, cat_name in BUILD_MAP.values():
+            item_id = self.ids.get(cat_name)
+            if item_id is None:
+                continue
+            queryset = model_class.objects.all()
+            if hasattr(model_class, "spec"):
+                queryset = queryset.select_related("spec")
+            yield cat_name, item_id, queryset
+
+    @property
+    def components(self):
+        if self._components is None:
+            components = dict.fromkeys(BUILD_CATEGORIES)
+            for cat_name, item_id, queryset in self._lookups():
+                components[cat_name] = queryset.in_bulk([item_id]).get(item_id)
+            self._components = components
+        return self._components
+
+    async def aload(self):
+        if self._components is None:
+            lookups = list(self._lookups())
+            found = await asyncio.gather(
+                *(queryset.ain_bulk([item_id]) for _, item_id, queryset in lookups)
+            )
+            components = dict.fromkeys(BUILD_CATEGORIES)
+            for (cat_name, item_id, _), rows in zip(lookups, found):
+                components[cat_name] = rows.get(item_id)
+            self._components = components
+        return self._components
+
+    def get(self, cat_name):
+        return self.components.get(cat_name)
+
+    def __getitem__(self, cat_name):
+        return self.components[cat_name]
+
+    def __contains__(self, cat_name):
+        return self.components.get(cat_name) is not None
+
+    def __iter__(self):
+        return iter(BUILD_CATEGORIES)
+
+    def items(self):
+        return self.components.items()
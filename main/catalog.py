@@ -0,0 +1,219 @@
+import threading
+import time
+from array import array
+from types import MappingProxyType
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F
+
+from .compatibility import (
+    case_form_factor_rank,
+    filter_compatible_motherboard_ids,
+    filter_compatible_psu_ids,
+    motherboard_form_factor_rank,
+)
+from .indexes import RankIndex, SocketIndex, WattageIndex
+from .metrics import EventCounter
+from .models import (
+    Cpu,
+    Motherboard,
+    Memory,
+    Case,
+    CpuCooler,
+    InternalHardDrive,
+    Os,
+    VideoCard,
+    PowerSupply,
+    CatalogVersion,
+)
+
+CATEGORY_MODELS = {
+    "cpu": Cpu,
+    "motherboard": Motherboard,
+    "memory": Memory,
+    "case": Case,
+    "cpu_cooler": CpuCooler,
+    "hdd": InternalHardDrive,
+    "os": Os,
+    "video_card": VideoCard,
+    "powersupply": PowerSupply,
+}
+
+
+_NO_IDS = array("q")
+
+
+def read_catalog_version():
+    return CatalogVersion.objects.filter(pk=1).values_list("version", flat=True).first() or 0
+
+
+def bump_catalog_version():
+    updated = CatalogVersion.objects.filter(pk=1).update(version=F("version") + 1)
+    if not updated:
+        CatalogVersion.objects.get_or_create(pk=1, defaults={"version": 1})
+    return read_catalog_version()
+
+
+def _socket(motherboard):
+    return motherboard.socket
+
+
+# Indexes derived from a category's snapshot: name -> (build, update). They
+# are built as soon as the snapshot loads, under the same lock.
+SNAPSHOT_INDEXES = {
+    "motherboard": {
+        "socket_index": (
+            lambda items: SocketIndex.build(items, _socket),
+            lambda index, items: index.updated(items, _socket),
+        ),
+    },
+    "case": {
+        "form_factor_index": (
+            lambda items: RankIndex.build(items, case_form_factor_rank),
+            lambda index, items: index.updated(items, case_form_factor_rank),
+        ),
+    },
+    "powersupply": {
+        # One sort over a few thousand wattages; rebuilt rather than updated.
+        "wattage_index": (WattageIndex, None),
+    },
+}
+
+
+def _catalog_queryset(model_class):
+    queryset = model_class.objects.all()
+    # Spec rows ride along so compatibility checks never re-parse text.
+    if hasattr(model_class, "spec"):
+        queryset = queryset.select_related("spec")
+    return queryset.order_by("id")
+
+
+class CategorySnapshot:
+    __slots__ = ("category", "version", "items", "by_id", "_derived", "_previous")
+
+    def __init__(self, category, version, items, previous=None):
+        self.category = category
+        self.version = version
+        self.items = tuple(items)
+        self.by_id = MappingProxyType({obj.id: obj for obj in self.items})
+        self._derived = {}
+        # Indexes of the snapshot this one replaces, to be updated rather
+        # than rebuilt from scratch.
+        self._previous = dict(previous._derived) if previous is not None else {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, item_id):
+        return self.by_id.get(item_id)
+
+    def derived(self, name, build, update=None):
+        # Indexes built from a snapshot live and die with it.
+        value = self._derived.get(name)
+        if value is None:
+            previous = self._previous.pop(name, None)
+            if previous is not None and update is not None:
+                value = update(previous, self.items)
+            else:
+                value = build(self.items)
+            self._derived[name] = value
+        return value
+
+
+class CatalogCache:
+    def __init__(self):
+        self._snapshots = {}
+        # One lock per category: a cold load of one category does not hold
+        # up lookups in the others.
+        self._locks = {category: threading.Lock() for category in CATEGORY_MODELS}
+        self._version = None
+        self._checked_at = 0.0
+        self.stats = EventCounter()
+
+    def version(self):
+        now = time.monotonic()
+        if self._version is None or now - self._checked_at >= settings.CATALOG_VERSION_CHECK_INTERVAL:
+            self._version = read_catalog_version()
+            self._checked_at = now
+        return self._version
+
+    def snapshot(self, category):
+        model_class = CATEGORY_MODELS[category]
+        version = self.version()
+        snapshot = self._snapshots.get(category)
+        if snapshot is not None and snapshot.version == version:
+            self.stats.incr("hits")
+            return snapshot
+
+        with self._locks[category]:
+            snapshot = self._snapshots.get(category)
+            if snapshot is not None and snapshot.version == version:
+                self.stats.incr("hits")
+                return snapshot
+            self.stats.incr("reloads" if snapshot is not None else "misses")
+            snapshot = CategorySnapshot(category, version, _catalog_queryset(model_class), previous=snapshot)
+            for name, (build, update) in SNAPSHOT_INDEXES.get(category, {}).items():
+                snapshot.derived(name, build, update)
+            self._snapshots[category] = snapshot
+        return snapshot
+
+    def get(self, category, item_id):
+        try:
+            item_id = int(item_id)
+        except (TypeError, ValueError):
+            return None
+        # A loaded snapshot answers for free; otherwise one primary-key
+        # query rather than loading and hydrating the whole category.
+        snapshot = self._snapshots.get(category)
+        if snapshot is not None and snapshot.version == self.version():
+            self.stats.incr("hits")
+            return snapshot.get(item_id)
+        self.stats.incr("lookups")
+        return _catalog_queryset(CATEGORY_MODELS[category]).in_bulk([item_id]).get(item_id)
+
+    async def aget(self, category, item_id):
+        # Snapshots are shared with the sync views; load them the same way.
+        return await sync_to_async(self.get)(category, item_id)
+
+    def all(self, category):
+        return self.snapshot(category).items
+
+    def socket_index(self):
+        return self.snapshot("motherboard").derived("socket_index", *SNAPSHOT_INDEXES["motherboard"]["socket_index"])
+
+    def form_factor_index(self):
+        return self.snapshot("case").derived("form_factor_index", *SNAPSHOT_INDEXES["case"]["form_factor_index"])
+
+    def wattage_index(self):
+        return self.snapshot("powersupply").derived("wattage_index", *SNAPSHOT_INDEXES["powersupply"]["wattage_index"])
+
+    def candidate_ids(self, category, build):
+        """Ids of the compatible candidates in id order, from the snapshot
+        indexes, or None where the category has no index for the build."""
+        if category == "motherboard" and build.get("cpu"):
+            return filter_compatible_motherboard_ids(self.socket_index(), build.get("cpu"))
+        if category == "case" and build.get("motherboard"):
+            rank = motherboard_form_factor_rank(build.get("motherboard"))
+            if rank is None:
+                return _NO_IDS
+            return self.form_factor_index().sorted_ids_at_least(rank)
+        if category == "powersupply":
+            return filter_compatible_psu_ids(
+                self.wattage_index(),
+                cpu=build.get("cpu"),
+                gpu=build.get("video_card"),
+                memory=build.get("memory"),
+                hdd=build.get("hdd"),
+            )
+        return None
+
+    async def acandidate_ids(self, category, build):
+        return await sync_to_async(self.candidate_ids)(category, build)
+
+    def invalidate(self):
+        self._snapshots.clear()
+        self._version = None
+
+
+catalog = CatalogCache()
@@ -0,0 +1,418 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .catalog import CATEGORY_MODELS, catalog
+from .compatibility import (
+    case_form_factor_rank,
+    motherboard_form_factor_rank,
+    parse_memory_capacity,
+    parse_memory_modules,
+    required_psu_wattage,
+)
+
+# File layout: MAGIC, header length (8 bytes), JSON header, then every column
+# as raw native-endian array data, each aligned to 8 bytes. Workers map the
+# file read-only, so the pages are shared through the OS page cache.
+MAGIC = b"PCBCOL1\0"
+NONE = -1
+
+# How long a process waits for another one's build before giving up.
+LOCK_TIMEOUT = 600
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock_file(f):
+        # LK_LOCK gives up after about 10 seconds and a build can take
+        # longer, so poll without blocking and back off up to a second.
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        delay = 0.01
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Timed out waiting for {f.name}")
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
+
+    def _unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_file(f):
+        fcntl.flock(f, fcntl.LOCK_EX)
+
+    def _unlock_file(f):
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+# Extra integer columns per category, besides id and name, and how the rows
+# are ordered on disk so that compatibility lookups are a bisect over a slice.
+COLUMNS = {
+    "cpu": ("socket",),
+    "motherboard": ("socket", "form_factor_rank"),
+    "case": ("form_factor_rank",),
+    "memory": ("capacity_gb", "module_count"),
+    "powersupply": ("wattage",),
+}
+ORDER_BY = {
+    "motherboard": "socket",
+    "case": "form_factor_rank",
+    "powersupply": "wattage",
+}
+
+
+def _or_none(value):
+    return NONE if value is None else value
+
+
+def _extract(category, obj, socket_codes):
+    if category == "cpu":
+        return (_or_none(socket_codes.get(obj.socket)),)
+    if category == "motherboard":
+        return (_or_none(socket_codes.get(obj.socket)), _or_none(motherboard_form_factor_rank(obj)))
+    if category == "case":
+        return (_or_none(case_form_factor_rank(obj)),)
+    if category == "memory":
+        return (_or_none(parse_memory_capacity(obj)), _or_none(parse_memory_modules(obj)))
+    if category == "powersupply":
+        return (_or_none(obj.wattage),)
+    return ()
+
+
+def _queryset(model_class):
+    queryset = model_class.objects.all()
+    if hasattr(model_class, "spec"):
+        queryset = queryset.select_related("spec")
+    return queryset.order_by("id")
+
+
+def _collect_sockets():
+    sockets = set()
+    for category in ("cpu", "motherboard"):
+        sockets.update(CATEGORY_MODELS[category].objects.exclude(socket=None).values_list("socket", flat=True))
+    return sorted(sockets)
+
+
+def write_columnar_catalog(path, version):
+    sockets = _collect_sockets()
+    # Codes keep the sockets' sort order, so None (-1) sorts first.
+    socket_codes = {socket: code for code, socket in enumerate(sockets)}
+
+    header = {"version": version, "sockets": sockets, "categories": {}}
+    chunks = []
+    offset = 0
+
+    def add_column(data):
+        nonlocal offset
+        raw = data.tobytes()
+        spec = [data.typecode, offset, len(data)]
+        padding = -len(raw) % 8
+        chunks.append(raw + b"\0" * padding)
+        offset += len(raw) + padding
+        return spec
+
+    interned = {}
+    names = bytearray()
+
+    for category, model_class in CATEGORY_MODELS.items():
+        extra = COLUMNS.get(category, ())
+        rows = [
+            (obj.id, obj.name or "", *_extract(category, obj, socket_codes))
+            for obj in _queryset(model_class).iterator(chunk_size=5000)
+        ]
+        order_by = ORDER_BY.get(category)
+        if order_by:
+            key = 2 + extra.index(order_by)
+            rows.sort(key=lambda row: (row[key], row[0]))
+
+        name_start, name_length = array("q"), array("i")
+        for row in rows:
+            encoded = row[1].encode("utf-8")
+            start = interned.get(encoded)
+            if start is None:
+                start = interned[encoded] = len(names)
+                names += encoded
+            name_start.append(start)
+            name_length.append(len(encoded))
+
+        ids = array("q", (row[0] for row in rows))
+        # Row positions in id order, for by-id lookups when rows are sorted
+        # by something else.
+        by_id = array("i", sorted(range(len(rows)), key=ids.__getitem__))
+        columns = {
+            "id": add_column(ids),
+            "by_id": add_column(by_id),
+            "name_start": add_column(name_start),
+            "name_length": add_column(name_length),
+        }
+        for i, column in enumerate(extra):
+            columns[column] = add_column(array("q", (row[2 + i] for row in rows)))
+        header["categories"][category] = {"rows": len(rows), "order_by": order_by, "columns": columns}
+
+    header["names"] = [offset, len(names)]
+    chunks.append(bytes(names))
+
+    raw_header = json.dumps(header).encode("utf-8")
+    data_start = len(MAGIC) + 8 + len(raw_header)
+    data_start += -data_start % 8
+    header_padding = data_start - len(MAGIC) - 8 - len(raw_header)
+
+    path = Path(path)
+    tmp = path.with_suffix(f".tmp{os.getpid()}")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<q", len(raw_header)))
+        f.write(raw_header)
+        f.write(b"\0" * header_padding)
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp, path)
+    return path
+
+
+class _Permuted:
+    # Sequence view of column[positions[i]], so bisect can search by id.
+    __slots__ = ("column", "positions")
+
+    def __init__(self, column, positions):
+        self.column = column
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, i):
+        return self.column[self.positions[i]]
+
+
+class ColumnarTable:
+    def __init__(self, store, category, meta):
+        self.category = category
+        self.rows = meta["rows"]
+        self.order_by = meta["order_by"]
+        self._store = store
+        self._columns = {name: store.column(*spec) for name, spec in meta["columns"].items()}
+
+    def __len__(self):
+        return self.rows
+
+    def column(self, name):
+        return self._columns[name]
+
+    @property
+    def ids(self):
+        return self._columns["id"]
+
+    def name(self, position):
+        start = self._columns["name_start"][position]
+        return self._store.name(start, self._columns["name_length"][position])
+
+    def position(self, item_id):
+        by_id = self._columns["by_id"]
+        i = bisect_left(_Permuted(self.ids, by_id), item_id)
+        if i < len(by_id) and self.ids[by_id[i]] == item_id:
+            return by_id[i]
+        return None
+
+    def row(self, item_id):
+        position = self.position(item_id)
+        if position is None:
+            return None
+        row = {"id": item_id, "name": self.name(position)}
+        for name in COLUMNS.get(self.category, ()):
+            value = self._columns[name][position]
+            if value == NONE:
+                value = None
+            elif name == "socket":
+                value = self._store.sockets[value]
+            row[name] = value
+        return row
+
+    def equal_range(self, value):
+        # Rows whose order_by column equals value (the table is sorted by it).
+        column = self._columns[self.order_by]
+        start = bisect_left(column, value)
+        return start, bisect_left(column, value + 1, lo=start)
+
+    def at_least(self, value):
+        return bisect_left(self._columns[self.order_by], value), self.rows
+
+
+class ColumnarCatalog:
+    """Read-only, zero-copy view of a catalog file written by write_columnar_catalog."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        if bytes(self._buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a columnar catalog")
+        (header_length,) = struct.unpack_from("<q", self._buffer, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(bytes(self._buffer[start:start + header_length]))
+        self._data_start = start + header_length + (-(start + header_length) % 8)
+
+        self.version = header["version"]
+        self.sockets = header["sockets"]
+        self.socket_codes = {socket: code for code, socket in enumerate(header["sockets"])}
+        self._case_ids = {}
+        self._psu_ids = {}
+        names_offset, names_length = header["names"]
+        self._names = self._slice(names_offset, names_length)
+        self.tables = {
+            category: ColumnarTable(self, category, meta)
+            for category, meta in header["categories"].items()
+        }
+
+    def _slice(self, offset, length):
+        start = self._data_start + offset
+        return self._buffer[start:start + length]
+
+    def column(self, typecode, offset, count):
+        return self._slice(offset, count * struct.calcsize(typecode)).cast(typecode)
+
+    def name(self, start, length):
+        return str(self._names[start:start + length], "utf-8")
+
+    def table(self, category):
+        return self.tables[category]
+
+    def motherboard_ids_for_socket(self, socket):
+        code = NONE if socket is None else self.socket_codes.get(socket)
+        if code is None:
+            return self.tables["motherboard"].ids[0:0]
+        start, stop = self.tables["motherboard"].equal_range(code)
+        return self.tables["motherboard"].ids[start:stop]
+
+    def case_ids_for_motherboard_rank(self, rank):
+        if rank is None:
+            return self.tables["case"].ids[0:0]
+        start, stop = self.tables["case"].at_least(rank)
+        return self.tables["case"].ids[start:stop]
+
+    def psu_ids_at_least(self, wattage):
+        start, stop = self.tables["powersupply"].at_least(max(wattage, 0))
+        return self.tables["powersupply"].ids[start:stop]
+
+    def sorted_case_ids_for_motherboard_rank(self, rank):
+        # The case table is ordered by rank; pagination bisects ids, so the
+        # few distinct ranks each get an id-ordered copy.
+        ids = self._case_ids.get(rank)
+        if ids is None:
+            ids = self._case_ids[rank] = array("q", sorted(self.case_ids_for_motherboard_rank(rank)))
+        return ids
+
+    def sorted_psu_ids_at_least(self, wattage):
+        start, stop = self.tables["powersupply"].at_least(max(wattage, 0))
+        ids = self._psu_ids.get(start)
+        if ids is None:
+            ids = self._psu_ids[start] = array("q", sorted(self.tables["powersupply"].ids[start:stop]))
+        return ids
+
+    def candidate_ids(self, category, build):
+        """Same contract as CatalogCache.candidate_ids, answered from the file."""
+        if category == "motherboard" and build.get("cpu"):
+            return self.motherboard_ids_for_socket(build.get("cpu").socket)
+        if category == "case" and build.get("motherboard"):
+            return self.sorted_case_ids_for_motherboard_rank(motherboard_form_factor_rank(build.get("motherboard")))
+        if category == "powersupply":
+            return self.sorted_psu_ids_at_least(required_psu_wattage(
+                build.get("cpu"), build.get("video_card"), build.get("memory"), build.get("hdd"),
+            ))
+        return None
+
+
+_lock = threading.Lock()
+_opened = None
+
+
+def columnar_path(version):
+    return Path(settings.COLUMNAR_CATALOG_DIR) / f"catalog-{version}.col"
+
+
+def _file_version(path):
+    try:
+        return int(path.stem.rsplit("-", 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def ensure_columnar_catalog(version):
+    """Write the file for `version` unless it exists; run by the commands that
+    bump the catalog version, never from a request."""
+    path = columnar_path(version)
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # One process writes the file; the others wait on the lock and reuse it.
+    with open(path.parent / "build.lock", "w") as lock:
+        _lock_file(lock)
+        try:
+            if not path.exists():
+                write_columnar_catalog(path, version)
+                prune_columnar_catalogs(path.parent, version)
+        finally:
+            _unlock_file(lock)
+    return path
+
+
+def prune_columnar_catalogs(directory, version):
+    # Only files older than `version` go: a newer file belongs to a version
+    # this process has not seen yet.
+    for old in Path(directory).glob("catalog-*.col"):
+        old_version = _file_version(old)
+        if old_version is not None and old_version < version:
+            try:
+                old.unlink(missing_ok=True)
+            except OSError:
+                # Still mapped by a worker (Windows refuses to delete it);
+                # the next build retries.
+                pass
+
+
+def shared_catalog():
+    """The columnar catalog for the current version, or None until it has been built."""
+    global _opened
+    version = catalog.version()
+    store = _opened
+    if store is not None and store.version == version:
+        return store
+    path = columnar_path(version)
+    if not path.exists():
+        return None
+    with _lock:
+        store = _opened
+        if store is None or store.version != version:
+            try:
+                store = _opened = ColumnarCatalog(path)
+            except FileNotFoundError:
+                # Pruned after a newer version was built.
+                return None
+    return store
+
+
+def candidate_ids(category, build):
+    """Compatible candidate ids in id order from the shared columnar catalog;
+    the worker's own snapshot indexes answer until its file is built."""
+    store = shared_catalog()
+    if store is None:
+        return catalog.candidate_ids(category, build)
+    return store.candidate_ids(category, build)
+
+
+async def acandidate_ids(category, build):
+    return await sync_to_async(candidate_ids)(category, build)
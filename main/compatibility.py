@@ -1,7 +1,18 @@
 import re
+from collections import namedtuple
+
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Coalesce
 
 _WATTAGE_HEADROOM = 1.50
 
+_FORM_FACTOR_RANKS = (
+    ("mini itx", 1),
+    ("micro atx", 2),
+    ("atx", 3),
+    ("extended atx", 4),
+)
+
 def _parse_ghz(text: str):
     if not text:
         return None
@@ -22,9 +33,38 @@ def _parse_gb(text: str):
     return int(m.group(1)) if m else None
 
 
+class _RecordSpec:
+    __slots__ = ("_record",)
+
+    def __init__(self, record):
+        self._record = record
+
+    def __getattr__(self, name):
+        return getattr(self._record, f"spec__{name}")
+
+
+def _spec(obj):
+    # Precomputed values are only used when the spec row was loaded together
+    # with the component (select_related("spec")), never via an extra query.
+    descriptor = getattr(type(obj), "spec", None)
+    if descriptor is None:
+        # Records (records.py) carry the spec columns as spec__<field>; all
+        # of them are NULL when the component has no spec row.
+        fields = getattr(obj, "_fields", ())
+        if any(getattr(obj, f) is not None for f in fields if f.startswith("spec__")):
+            return _RecordSpec(obj)
+        return None
+    if not descriptor.is_cached(obj):
+        return None
+    return descriptor.related.get_cached_value(obj)
+
+
 def estimate_cpu_power(cpu):
     if cpu is None:
         return 0
+    spec = _spec(cpu)
+    if spec is not None:
+        return spec.power_draw
     if cpu.tdp:
         return cpu.tdp
     ghz = _parse_ghz(cpu.boost_clock or cpu.core_clock or '')
@@ -37,6 +77,9 @@ def estimate_cpu_power(cpu):
 def estimate_gpu_power(gpu):
     if gpu is None:
         return 0
+    spec = _spec(gpu)
+    if spec is not None:
+        return spec.power_draw
     mem_gb = _parse_gb(gpu.memory or '')
     if mem_gb is None:
         return 150
@@ -47,17 +90,27 @@ def estimate_gpu_power(gpu):
     return 250
 
 
+def parse_memory_modules(memory):
+    m = re.match(r'(\d+)\s*x', (memory.modules or '').lower())
+    return int(m.group(1)) if m else None
+
+
 def estimate_memory_power(memory):
     if memory is None:
         return 0
-    m = re.match(r'(\d+)\s*x', (memory.modules or '').lower())
-    modules = int(m.group(1)) if m else 2
+    spec = _spec(memory)
+    if spec is not None:
+        return spec.power_draw
+    modules = parse_memory_modules(memory) or 2
     return modules * 4
 
 
 def estimate_drive_power(hdd):
     if hdd is None:
         return 0
+    spec = _spec(hdd)
+    if spec is not None:
+        return spec.power_draw
     t = (hdd.type or '').lower()
     if 'ssd' in t:
         return 3
@@ -79,23 +132,36 @@ def estimate_build_power(cpu=None, gpu=None, memory=None, hdd=None):
     return total
 
 
+def required_psu_wattage(cpu=None, gpu=None, memory=None, hdd=None):
+    return estimate_build_power(cpu, gpu, memory, hdd) * _WATTAGE_HEADROOM
+
+
 def is_powersupply_sufficient(psu, cpu=None, gpu=None, memory=None, hdd=None):
     if psu is None:
         return False
     if psu.wattage is None:
         return False
 
-    required = estimate_build_power(cpu, gpu, memory, hdd)
-    return psu.wattage >= required * _WATTAGE_HEADROOM
+    return psu.wattage >= required_psu_wattage(cpu, gpu, memory, hdd)
 
 
 def filter_compatible_psu(all_psu, cpu=None, gpu=None, memory=None, hdd=None):
+    # The requirement depends only on the build, so compute it once.
+    required = required_psu_wattage(cpu, gpu, memory, hdd)
     return [
         p for p in all_psu
-        if is_powersupply_sufficient(p, cpu, gpu, memory, hdd)
+        if p.wattage is not None and p.wattage >= required
     ]
 
 
+def filter_compatible_psu_ids(wattage_index, cpu=None, gpu=None, memory=None, hdd=None):
+    return wattage_index.sorted_ids_at_least(required_psu_wattage(cpu, gpu, memory, hdd))
+
+
+def filter_compatible_psu_qs(all_psu, cpu=None, gpu=None, memory=None, hdd=None):
+    return all_psu.filter(wattage__gte=required_psu_wattage(cpu, gpu, memory, hdd))
+
+
 
 def is_compatible_cpu_motherboard(cpu, motherboard):
     return cpu.socket == motherboard.socket
@@ -109,27 +175,55 @@ def filter_compatible_motherboards(cpu, all_motherboards):
     return compatible
 
 
+def filter_compatible_motherboard_ids(socket_index, cpu):
+    return socket_index.ids_for_socket(cpu.socket)
+
+
+def filter_compatible_motherboards_qs(cpu, all_motherboards):
+    if cpu.socket is None:
+        return all_motherboards.filter(socket__isnull=True)
+    return all_motherboards.filter(socket=cpu.socket)
+
+
 def parse_form_factor(text):
     if not text:
         return None
     text = text.lower()
-    ranks = {
-        "mini itx": 1,
-        "micro atx": 2,
-        "atx": 3,
-        "extended atx": 4,
-    }
-
-    for ff, rank in ranks.items():
+
+    for ff, rank in _FORM_FACTOR_RANKS:
         if ff in text:
             return rank
 
     return None
 
 
+def form_factor_rank_expression(field):
+    # SQL twin of parse_form_factor: same substrings, same precedence.
+    parsed = Case(
+        *[When(**{f"{field}__icontains": ff}, then=Value(rank)) for ff, rank in _FORM_FACTOR_RANKS],
+        default=None,
+        output_field=IntegerField(),
+    )
+    return Coalesce(F("spec__form_factor_rank"), parsed)
+
+
+def motherboard_form_factor_rank(motherboard):
+    spec = _spec(motherboard)
+    if spec is not None:
+        return spec.form_factor_rank
+    return parse_form_factor(motherboard.form_factor or "")
+
+
+def case_form_factor_rank(case):
+    spec = _spec(case)
+    if spec is not None:
+        return spec.form_factor_rank
+    return parse_form_factor(case.type or "")
+
+
 def is_case_compatible_with_motherboard(motherboard, case):
-    mb_rank = parse_form_factor(motherboard.form_factor or "")
-    case_rank = parse_form_factor(case.type or "")
+    mb_rank = motherboard_form_factor_rank(motherboard)
+    case_rank = case_form_factor_rank(case)
 
     if mb_rank is None or case_rank is None:
         return False
@@ -145,6 +239,22 @@ def filter_compatible_cases_by_motherboard(motherboard, all_cases):
     return result
 
 
+def filter_compatible_case_ids(form_factor_index, motherboard):
+    mb_rank = motherboard_form_factor_rank(motherboard)
+    if mb_rank is None:
+        return form_factor_index.ranked_ids[0:0]
+    return form_factor_index.ids_at_least(mb_rank)
+
+
+def filter_compatible_cases_by_motherboard_qs(motherboard, all_cases):
+    mb_rank = motherboard_form_factor_rank(motherboard)
+    if mb_rank is None:
+        return all_cases.none()
+    return all_cases.alias(
+        ff_rank=form_factor_rank_expression("type"),
+    ).filter(ff_rank__gte=mb_rank)
+
+
 def parse_psu_wattage(psu_text):
     if not psu_text:
         return None
@@ -159,6 +269,9 @@ def parse_psu_wattage(psu_text):
 
 
 def parse_memory_capacity(memory):
+    spec = _spec(memory)
+    if spec is not None:
+        return spec.capacity_gb
     modules_text = memory.modules
     if not modules_text:
         return None
@@ -229,3 +342,79 @@ def filter_compatible_memory_for_build(all_memory, cpu=None, motherboard=None, o
             continue
         result.append(mem)
     return result
+
+
+# Which build slots narrow down the candidate list of each category.
+CANDIDATE_DEPENDS_ON = {
+    "motherboard": ("cpu",),
+    "case": ("motherboard",),
+    "powersupply": ("cpu", "video_card", "memory", "hdd"),
+}
+
+
+def filter_compatible_candidates_qs(category, queryset, build):
+    if category == "motherboard" and build.get("cpu"):
+        return filter_compatible_motherboards_qs(build.get("cpu"), queryset)
+    if category == "case" and build.get("motherboard"):
+        return filter_compatible_cases_by_motherboard_qs(build.get("motherboard"), queryset)
+    if category == "powersupply":
+        return filter_compatible_psu_qs(
+            queryset,
+            cpu=build.get("cpu"),
+            gpu=build.get("video_card"),
+            memory=build.get("memory"),
+            hdd=build.get("hdd"),
+        )
+    return queryset
+
+
+Rule = namedtuple("Rule", ["name", "requires", "depends_on", "check"])
+
+# requires: slots that must be filled for the rule to apply.
+# depends_on: every slot the check reads (requires plus optional inputs).
+COMPATIBILITY_RULES = (
+    Rule(
+        "cpu_motherboard_socket",
+        ("cpu", "motherboard"),
+        ("cpu", "motherboard"),
+        lambda b: is_compatible_cpu_motherboard(b["cpu"], b["motherboard"]),
+    ),
+    Rule(
+        "case_motherboard_form_factor",
+        ("motherboard", "case"),
+        ("motherboard", "case"),
+        lambda b: is_case_compatible_with_motherboard(b["motherboard"], b["case"]),
+    ),
+    Rule(
+        "memory_cpu",
+        ("memory", "cpu"),
+        ("memory", "cpu"),
+        lambda b: is_memory_compatible_with_cpu(b["memory"], b["cpu"]),
+    ),
+    Rule(
+        "memory_motherboard",
+        ("memory", "motherboard"),
+        ("memory", "motherboard"),
+        lambda b: is_memory_compatible_with_motherboard(b["memory"], b["motherboard"]),
+    ),
+    Rule(
+        "memory_os",
+        ("memory", "os"),
+        ("memory", "os"),
+        lambda b: is_memory_compatible_with_os(b["memory"], b["os"]),
+    ),
+    Rule(
+        "powersupply_wattage",
+        ("powersupply",),
+        ("powersupply", "cpu", "video_card", "memory", "hdd"),
+        lambda b: is_powersupply_sufficient(
+            b["powersupply"], b.get("cpu"), b.get("video_card"), b.get("memory"), b.get("hdd"),
+        ),
+    ),
+)
+
+
+def evaluate_rule(rule, components):
+    if any(components.get(slot) is None for slot in rule.requires):
+        return None
+    return bool(rule.check(components))
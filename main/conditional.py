@@ -0,0 +1,100 @@
+import hashlib
+from functools import lru_cache, wraps
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+
+from .build import BuildContext
+from .catalog import catalog
+from .compatibility import CANDIDATE_DEPENDS_ON
+
+
+@lru_cache(maxsize=None)
+def _checkout_revision():
+    # The deployed commit when running from a git checkout, else "".
+    git = Path(settings.BASE_DIR) / ".git"
+    try:
+        head = (git / "HEAD").read_text().strip()
+        if not head.startswith("ref: "):
+            return head
+        ref = head[len("ref: "):]
+        if (git / ref).exists():
+            return (git / ref).read_text().strip()
+        for line in (git / "packed-refs").read_text().splitlines():
+            if line.endswith(f" {ref}"):
+                return line.split(" ", 1)[0]
+    except OSError:
+        pass
+    return ""
+
+
+def release_salt():
+    # Templates and code change on deploy without a catalog version bump.
+    return settings.CATALOG_ETAG_SALT or _checkout_revision()
+
+
+def _validators(request, category, item_id=None, uses_build=False):
+    # Everything the rendered page depends on, read from the session and the
+    # catalog version only: no catalog rows, no user row, no template.
+    session = request.session
+    compatibility_on = session.get("compatibility_on", True)
+    selected = ()
+    if uses_build and compatibility_on:
+        ids = BuildContext.for_request(request).ids
+        selected = tuple(ids.get(slot) for slot in CANDIDATE_DEPENDS_ON.get(category, ()))
+    signed_in = session.get(SESSION_KEY) is not None
+
+    state = (
+        release_salt(), catalog.version(), category, item_id, request.GET.urlencode(),
+        compatibility_on, selected, signed_in,
+    )
+    # No Last-Modified: a date cannot carry the release salt or the
+    # signed-in state, so If-Modified-Since alone would get stale 304s
+    # after a deploy or a login. The ETag is the only validator.
+    etag = quote_etag(hashlib.sha1(repr(state).encode("utf-8")).hexdigest())
+    return etag, not (signed_in or selected)
+
+
+def _finish(request, response, etag, shared):
+    if request.method not in ("GET", "HEAD") or response.status_code not in (200, 304):
+        return response
+    response.headers.setdefault("ETag", etag)
+    if shared:
+        patch_cache_control(response, public=True, max_age=settings.CATALOG_HTTP_MAX_AGE)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ("Cookie",))
+    return response
+
+
+def catalog_conditional(uses_build=False):
+    """ETag handling for catalog pages.
+
+    Answers 304 before the view runs when the catalog version and the session
+    state the page depends on are unchanged.
+    """
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                validators = await sync_to_async(_validators)(request, *args, uses_build=uses_build, **kwargs)
+                response = get_conditional_response(request, etag=validators[0])
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _finish(request, response, *validators)
+        else:
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                validators = _validators(request, *args, uses_build=uses_build, **kwargs)
+                response = get_conditional_response(request, etag=validators[0])
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                return _finish(request, response, *validators)
+        return inner
+
+    return decorator
@@ -0,0 +1,7 @@
+from django.utils.functional import SimpleLazyObject
+
+from .build import BuildContext
+
+
+def build(request):
+    return {"build": SimpleLazyObject(lambda: BuildContext.for_request(request))}
@@ -0,0 +1,94 @@
+from .build import BUILD_CATEGORIES
+from .catalog import CATEGORY_MODELS, catalog
+from .columnar import shared_catalog
+from .compatibility import (
+    CANDIDATE_DEPENDS_ON,
+    COMPATIBILITY_RULES,
+    evaluate_rule,
+    filter_compatible_candidates_qs,
+    motherboard_form_factor_rank,
+    required_psu_wattage,
+)
+
+STATE_SESSION_KEY = "build_compatibility_state"
+
+# Slot -> rules / candidate lists that have to be re-evaluated when it changes.
+RULES_BY_SLOT = {
+    slot: tuple(rule for rule in COMPATIBILITY_RULES if slot in rule.depends_on)
+    for slot in BUILD_CATEGORIES
+}
+CANDIDATES_BY_SLOT = {
+    slot: tuple(cat for cat, deps in CANDIDATE_DEPENDS_ON.items() if slot in deps)
+    for slot in BUILD_CATEGORIES
+}
+
+_STATUS = {True: "pass", False: "fail", None: "skipped"}
+
+
+def candidate_count(category, components):
+    # Counted over the shared columnar catalog: no queries, no model rows.
+    # Mirrors filter_compatible_candidates_qs, which is the fallback until
+    # the file for the current version has been built.
+    store = shared_catalog()
+    if store is None:
+        queryset = CATEGORY_MODELS[category].objects.all()
+        return filter_compatible_candidates_qs(category, queryset, components).count()
+    if category == "powersupply":
+        required = required_psu_wattage(
+            components.get("cpu"),
+            components.get("video_card"),
+            components.get("memory"),
+            components.get("hdd"),
+        )
+        return len(store.psu_ids_at_least(required))
+    if category == "motherboard" and components.get("cpu"):
+        return len(store.motherboard_ids_for_socket(components["cpu"].socket))
+    if category == "case" and components.get("motherboard"):
+        return len(store.case_ids_for_motherboard_rank(motherboard_form_factor_rank(components["motherboard"])))
+    return len(store.table(category))
+
+
+def _state_key(components):
+    ids = [obj.id if obj is not None else None for obj in (components.get(cat) for cat in BUILD_CATEGORIES)]
+    return [catalog.version()] + ids
+
+
+def slot_change_delta(session, components, slot, new_obj):
+    before = dict(components)
+    after = dict(components)
+    after[slot] = new_obj
+
+    # The last evaluated state is kept in the session; it is only trusted
+    # if it was computed for exactly the build we are changing.
+    state = session.get(STATE_SESSION_KEY) or {}
+    if state.get("key") != _state_key(before):
+        state = {}
+    rule_states = dict(state.get("rules", {}))
+    counts = dict(state.get("candidates", {}))
+
+    changed_rules = []
+    for rule in RULES_BY_SLOT[slot]:
+        old = rule_states[rule.name] if rule.name in rule_states else evaluate_rule(rule, before)
+        new = evaluate_rule(rule, after)
+        rule_states[rule.name] = new
+        if old != new:
+            changed_rules.append({"rule": rule.name, "before": _STATUS[old], "after": _STATUS[new]})
+
+    changed_candidates = []
+    for category in CANDIDATES_BY_SLOT[slot]:
+        old = counts[category] if category in counts else candidate_count(category, before)
+        new = candidate_count(category, after)
+        counts[category] = new
+        if old != new:
+            changed_candidates.append({"category": category, "before": old, "after": new})
+
+    session[STATE_SESSION_KEY] = {
+        "key": _state_key(after),
+        "rules": rule_states,
+        "candidates": counts,
+    }
+    return {
+        "slot": slot,
+        "rules": changed_rules,
+        "candidates": changed_candidates,
+    }
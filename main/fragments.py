@@ -0,0 +1,70 @@
+import hashlib
+
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import caches
+
+from .catalog import catalog
+from .compatibility import CANDIDATE_DEPENDS_ON
+from .metrics import cache_counter
+from .pagination import page_size_from_request
+
+fragment_cache_stats = cache_counter("fragment")
+
+
+def _cache():
+    return caches["fragments"]
+
+
+def _generations():
+    # Not the fragments cache: culling there must not reset a generation
+    # and bring back the fragments it retired.
+    return caches["fragment_generations"]
+
+
+def _generation(category):
+    return _generations().get(f"fragment-generation:{category}", 0)
+
+
+def list_fragment_parts(request, category, compatibility_on, build):
+    # What the rendered item list depends on besides the catalog itself.
+    selected = ()
+    if compatibility_on:
+        selected = tuple(build.ids.get(slot) for slot in CANDIDATE_DEPENDS_ON.get(category, ()))
+    return (
+        compatibility_on,
+        selected,
+        request.session.get(SESSION_KEY) is not None,
+        request.GET.get("sort", "id"),
+        request.GET.get("after"),
+        page_size_from_request(request),
+    )
+
+
+def fragment_cache_key(category, parts):
+    # Resolved at render time, so the version check never runs on the event
+    # loop for async views.
+    raw = repr((category, catalog.version(), _generation(category), parts)).encode("utf-8")
+    return "fragment:" + hashlib.sha1(raw).hexdigest()
+
+
+def get_fragment(key):
+    html = _cache().get(key)
+    fragment_cache_stats.incr("hits" if html is not None else "misses")
+    return html
+
+
+def set_fragment(key, html):
+    _cache().set(key, html)
+
+
+def evict_fragments(category=None):
+    # Per-category eviction bumps a generation number that is part of every
+    # key, so stale entries are never read again and age out of the cache.
+    if category is None:
+        _cache().clear()
+        return
+    key = f"fragment-generation:{category}"
+    generations = _generations()
+    generations.add(key, 0, timeout=None)
+    generations.incr(key)
+    fragment_cache_stats.incr("evictions")
@@ -0,0 +1,133 @@
+from array import array
+from bisect import bisect_left
+
+
+class WattageIndex:
+    """PSU ids ordered by wattage, so "at least N watts" is one bisect."""
+
+    __slots__ = ("wattages", "ids", "_sorted")
+
+    def __init__(self, psus):
+        pairs = sorted((p.wattage, p.id) for p in psus if p.wattage is not None)
+        self.wattages = array("q", (w for w, _ in pairs))
+        self.ids = array("q", (i for _, i in pairs))
+        self._sorted = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, required):
+        return bisect_left(self.wattages, required)
+
+    def ids_at_least(self, required):
+        return self.ids[self.position(required):]
+
+    def count_at_least(self, required):
+        return len(self.ids) - self.position(required)
+
+    def sorted_ids_at_least(self, required):
+        # The same ids in id order, for keyset pages; one array per distinct
+        # wattage, however many builds map to it.
+        position = self.position(required)
+        ids = self._sorted.get(position)
+        if ids is None:
+            ids = self._sorted[position] = array("q", sorted(self.ids[position:]))
+        return ids
+
+
+_MISSING = object()
+_EMPTY = array("q")
+
+
+class BucketIndex:
+    """Ids grouped by a key, each bucket sorted, so "all ids with key k" is one lookup.
+
+    updated() derives the index for a newer snapshot of the same rows and
+    only regroups the buckets whose members changed; the rest are shared.
+    """
+
+    __slots__ = ("keys", "buckets")
+
+    def __init__(self, keys, buckets):
+        self.keys = keys
+        self.buckets = buckets
+
+    @classmethod
+    def build(cls, items, key):
+        keys = {obj.id: key(obj) for obj in items}
+        return cls(keys, cls._group(keys, None))
+
+    @staticmethod
+    def _group(keys, only):
+        groups = {}
+        for item_id, value in keys.items():
+            if only is None or value in only:
+                groups.setdefault(value, []).append(item_id)
+        return {value: array("q", sorted(ids)) for value, ids in groups.items()}
+
+    def updated(self, items, key):
+        keys = {obj.id: key(obj) for obj in items}
+        touched = set()
+        for item_id, value in keys.items():
+            old = self.keys.get(item_id, _MISSING)
+            if old != value:
+                touched.add(value)
+                if old is not _MISSING:
+                    touched.add(old)
+        for item_id in self.keys.keys() - keys.keys():
+            touched.add(self.keys[item_id])
+        buckets = {value: ids for value, ids in self.buckets.items() if value not in touched}
+        if touched:
+            buckets.update(self._group(keys, touched))
+        return type(self)(keys, buckets)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def ids(self, value):
+        return self.buckets.get(value, _EMPTY)
+
+
+class SocketIndex(BucketIndex):
+    """Motherboard ids by socket; a None socket is a bucket of its own."""
+
+    __slots__ = ()
+
+    def ids_for_socket(self, socket):
+        return self.ids(socket)
+
+
+class RankIndex(BucketIndex):
+    """Ids bucketed by an integer rank, laid out rank by rank with prefix sums
+    of the bucket sizes, so "rank >= r" is a bisect plus a slice. Rows
+    without a rank are left out of the ranked view.
+    """
+
+    __slots__ = ("ranks", "starts", "ranked_ids", "_sorted")
+
+    def __init__(self, keys, buckets):
+        super().__init__(keys, buckets)
+        self._sorted = {}
+        self.ranks = sorted(rank for rank in buckets if rank is not None)
+        self.starts = array("q", [0])
+        self.ranked_ids = array("q")
+        for rank in self.ranks:
+            self.ranked_ids.extend(buckets[rank])
+            self.starts.append(len(self.ranked_ids))
+
+    def position(self, rank):
+        return self.starts[bisect_left(self.ranks, rank)]
+
+    def ids_at_least(self, rank):
+        return self.ranked_ids[self.position(rank):]
+
+    def count_at_least(self, rank):
+        return len(self.ranked_ids) - self.position(rank)
+
+    def sorted_ids_at_least(self, rank):
+        # The same ids in id order, for keyset pages; one array per rank.
+        position = self.position(rank)
+        ids = self._sorted.get(position)
+        if ids is None:
+            ids = self._sorted[position] = array("q", sorted(self.ranked_ids[position:]))
+        return ids
@@ -0,0 +1,44 @@
+import time
+from contextvars import ContextVar
+
+from .querylog import _explaining, query_log
+
+current_stats = ContextVar("current_request_stats", default=None)
+
+
+class RequestStats:
+    __slots__ = ("started", "total_time", "queries", "db_time", "template_time")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total_time = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.started
+
+
+def record_query(execute, sql, params, many, context):
+    if _explaining.get():
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        result = execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        stats = current_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+    query_log.record(sql, params, many, elapsed, context["connection"])
+    return result
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    # Connected to connection_created, so every thread's connection (including
+    # the ones async views use through sync_to_async) reports to the request
+    # that is active in the current context.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -0,0 +1,182 @@
+import json
+import random
+import re
+import secrets
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from http.cookiejar import CookieJar
+
+BROWSE_CATEGORIES = ("cpu", "motherboard", "memory", "case", "video_card", "powersupply")
+_CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Every request is timed on its own; redirects are not followed.
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, seconds, ok):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def summary(self, elapsed):
+        def pct(ordered, fraction):
+            return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+        endpoints = {}
+        total = errors = 0
+        for endpoint, values in sorted(self.latencies.items()):
+            ordered = sorted(values)
+            total += len(values)
+            errors += self.errors[endpoint]
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "rps": round(len(values) / elapsed, 2),
+                "p50_ms": round(statistics.median(ordered) * 1000, 2),
+                "p95_ms": round(pct(ordered, 0.95), 2),
+                "p99_ms": round(pct(ordered, 0.99), 2),
+                "error_rate": round(self.errors[endpoint] / len(values), 4),
+            }
+        return {
+            "duration_s": round(elapsed, 2),
+            "requests": total,
+            "rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+class VirtualUser:
+    def __init__(self, base_url, recorder, rng, think_time, username=None, password=None):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.rng = rng
+        self.think_time = think_time
+        self.username = username
+        self.password = password
+        self.cookies = CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect,
+        )
+
+    def request(self, endpoint, path, params=None, data=None, headers=None):
+        url = self.base_url + path
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(url, data=body, headers=headers or {})
+        if body is not None:
+            request.add_header("Referer", url)
+
+        started = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                payload = response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            payload = e.read()
+            status = e.code
+        except OSError:
+            payload, status = b"", 599
+        self.recorder.add(endpoint, time.perf_counter() - started, status < 400)
+        return status, payload
+
+    def think(self):
+        if self.think_time:
+            time.sleep(self.rng.uniform(0, self.think_time))
+
+    def sign_in(self):
+        if self.username:
+            path, data = "/accounts/login/", {"username": self.username, "password": self.password}
+            endpoint = "accounts:login"
+        else:
+            password = secrets.token_urlsafe(16)
+            path = "/accounts/register/"
+            data = {"username": f"load-{secrets.token_hex(6)}", "password1": password, "password2": password}
+            endpoint = "accounts:register"
+
+        _, page = self.request(endpoint, path)
+        match = _CSRF_INPUT.search(page.decode("utf-8", "replace"))
+        data["csrfmiddlewaretoken"] = match.group(1) if match else ""
+        status, _ = self.request(endpoint, path, data=data)
+        return status == 302
+
+    def search_and_pick(self, category):
+        # Type a word from the first page one keystroke at a time, the way the
+        # search box fires ajax_search.
+        status, payload = self.request("main:ajax_search", f"/ajax_search/{category}/")
+        if status != 200:
+            return None
+        items = json.loads(payload)["items"]
+        if not items:
+            return None
+        word = (self.rng.choice(items)["name"] or "").split(" ")[0].lower()
+        for length in range(1, min(len(word), 5) + 1):
+            status, payload = self.request(
+                "main:ajax_search", f"/ajax_search/{category}/", {"q": word[:length]},
+            )
+        if status == 200:
+            items = json.loads(payload)["items"] or items
+        return self.rng.choice(items)["id"]
+
+    def session(self):
+        categories = self.rng.sample(BROWSE_CATEGORIES, self.rng.randint(2, len(BROWSE_CATEGORIES)))
+        for category in categories:
+            self.request("main:list_components", f"/category/{category}/")
+            self.think()
+            item_id = self.search_and_pick(category)
+            if item_id is None:
+                continue
+            headers = {"Accept": "application/json"} if self.rng.random() < 0.5 else None
+            self.request("main:add_to_build", f"/add/{category}/{item_id}/", headers=headers)
+            self.think()
+            if self.rng.random() < 0.15:
+                self.request("main:remove_from_build", f"/remove/{category}/", headers=headers)
+
+        self.request("main:show_build", "/show_build/")
+        self.think()
+        if self.rng.random() < 0.3:
+            self.request("main:save_build_to_db", "/save_build_to_db/")
+        self.request("main:my_builds", "/my_builds/")
+        self.think()
+
+    def run(self, deadline):
+        if not self.sign_in():
+            return
+        while time.monotonic() < deadline:
+            self.session()
+
+
+def run_load(base_url, users, duration, think_time=0.0, seed=0, username=None, password=None):
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(
+            target=VirtualUser(
+                base_url, recorder, random.Random(f"{seed}:{i}"), think_time, username, password,
+            ).run,
+            args=(deadline,),
+            daemon=True,
+        )
+        for i in range(users)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.summary(time.monotonic() - started)
@@ -0,0 +1,55 @@
+import random
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.benchmarks import best_of
+from main.compatibility import (
+    filter_compatible_psu,
+    filter_compatible_psu_ids,
+    is_powersupply_sufficient,
+)
+from main.indexes import WattageIndex
+
+
+class Command(BaseCommand):
+    help = "Compare the per-row PSU compatibility loop with the wattage index on a synthetic catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        wattages = [None, 400, 450, 500, 550, 650, 750, 850, 1000, 1200, 1600]
+        psus = [
+            SimpleNamespace(id=i, wattage=rng.choice(wattages))
+            for i in range(1, options["rows"] + 1)
+        ]
+        cpu = SimpleNamespace(tdp=None, boost_clock="5.4 GHz", core_clock="3.0 GHz")
+        gpu = SimpleNamespace(memory="12 GB")
+        memory = SimpleNamespace(modules="2 x 16GB")
+        hdd = SimpleNamespace(type="SSD")
+        build = dict(cpu=cpu, gpu=gpu, memory=memory, hdd=hdd)
+        repeat = options["repeat"]
+
+        per_row, expected = best_of(repeat, lambda: [
+            p for p in psus if is_powersupply_sufficient(p, **build)
+        ])
+        hoisted, hoisted_result = best_of(repeat, lambda: filter_compatible_psu(psus, **build))
+        index_build, index = best_of(repeat, lambda: WattageIndex(psus))
+        lookup, ids = best_of(repeat, lambda: filter_compatible_psu_ids(index, **build))
+
+        # Checked explicitly: asserts are stripped under python -O.
+        expected_ids = {p.id for p in expected}
+        if {p.id for p in hoisted_result} != expected_ids:
+            raise CommandError("hoisted requirement disagrees with the per-row loop")
+        if set(ids) != expected_ids:
+            raise CommandError("wattage index disagrees with the per-row loop")
+
+        self.stdout.write(f"rows: {len(psus)}, compatible: {len(expected_ids)}")
+        self.stdout.write(f"per-row loop:         {per_row * 1000:9.3f} ms")
+        self.stdout.write(f"hoisted requirement:  {hoisted * 1000:9.3f} ms")
+        self.stdout.write(f"wattage index build:  {index_build * 1000:9.3f} ms")
+        self.stdout.write(f"wattage index lookup: {lookup * 1000:9.3f} ms")
@@ -0,0 +1,64 @@
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.benchmarks import best_of
+from main.catalog import CATEGORY_MODELS
+from main.records import component_records
+
+
+def _retained(func):
+    # Memory still held by the result once it has been built, plus the peak.
+    tracemalloc.start()
+    try:
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return current, peak
+
+
+class Command(BaseCommand):
+    help = "Compare loading catalog rows as model instances and as slim records."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--category", default="motherboard", choices=sorted(CATEGORY_MODELS))
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        category = options["category"]
+        queryset = CATEGORY_MODELS[category].objects.order_by("id")[:options["rows"]]
+        records = component_records(queryset, category)
+        rows = queryset.count()
+        if not rows:
+            raise CommandError(f"Category {category} is empty, run generate_catalog first")
+
+        def load_models():
+            return list(queryset.all())
+
+        def load_records():
+            return list(records.all())
+
+        repeat = options["repeat"]
+        models_time, models = best_of(repeat, load_models)
+        records_time, slim = best_of(repeat, load_records)
+        if [(m.id, m.name) for m in models] != [(r.id, r.name) for r in slim]:
+            raise CommandError("records and model instances disagree")
+        del models, slim
+
+        models_current, models_peak = _retained(load_models)
+        records_current, records_peak = _retained(load_records)
+
+        scale = 100_000 / rows
+        self.stdout.write(f"category: {category}, rows: {rows} (per 100k rows below)")
+        self.stdout.write(f"{'':10} {'time ms':>10} {'retained MB':>12} {'peak MB':>10}")
+        for label, elapsed, current, peak in (
+            ("models", models_time, models_current, models_peak),
+            ("records", records_time, records_current, records_peak),
+        ):
+            self.stdout.write(
+                f"{label:10} {elapsed * 1000 * scale:10.1f} "
+                f"{current * scale / 2**20:12.1f} {peak * scale / 2**20:10.1f}"
+            )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from main.catalog import read_catalog_version
+from main.columnar import ColumnarCatalog, ensure_columnar_catalog
+
+
+class Command(BaseCommand):
+    help = "Write the memory-mapped columnar catalog for the current catalog version ahead of the workers."
+
+    def handle(self, *args, **options):
+        path = ensure_columnar_catalog(read_catalog_version())
+        store = ColumnarCatalog(path)
+        rows = ", ".join(f"{category} {len(table)}" for category, table in store.tables.items())
+        self.stdout.write(f"{path} ({path.stat().st_size // 1024} KiB): {rows}")
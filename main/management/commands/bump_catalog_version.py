@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from main.catalog import bump_catalog_version
+from main.columnar import ensure_columnar_catalog
+from main.fragments import evict_fragments
+
+
+class Command(BaseCommand):
+    help = "Mark the catalog as changed so every worker reloads its cached snapshots."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--no-columnar", action="store_true",
+            help="Do not write the columnar catalog for the new version (run build_columnar_catalog later).",
+        )
+
+    def handle(self, *args, **options):
+        version = bump_catalog_version()
+        # Only reaches other workers when the fragments cache is shared
+        # (memcached/redis); with locmem the version bump retires them.
+        evict_fragments()
+        self.stdout.write(f"catalog version: {version}")
+        if not options["no_columnar"]:
+            self.stdout.write(f"columnar catalog: {ensure_columnar_catalog(version)}")
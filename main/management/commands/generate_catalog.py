@@ -0,0 +1,77 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.catalog import CATEGORY_MODELS, bump_catalog_version
+from main.columnar import ensure_columnar_catalog
+from main.fragments import evict_fragments
+from main.specs import SPEC_MAP, refresh_specs
+from main.synthetic import clear_catalog, generate_category, next_id
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the catalog tables with synthetic components for load testing. "
+        "Uses COPY on PostgreSQL and batched inserts elsewhere."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, required=True, help="Rows to add per category.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--categories", nargs="+", choices=list(CATEGORY_MODELS), default=list(CATEGORY_MODELS),
+        )
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--truncate", action="store_true",
+            help="Delete existing rows (and spec rows) of the chosen categories first.",
+        )
+        parser.add_argument(
+            "--detach-saved-builds", action="store_true",
+            help="With --truncate: clear saved builds' references to the deleted rows instead of refusing.",
+        )
+        parser.add_argument(
+            "--no-specs", action="store_true",
+            help="Skip rebuilding the normalized spec tables afterwards.",
+        )
+        parser.add_argument(
+            "--no-columnar", action="store_true",
+            help="Do not write the columnar catalog for the new version (run build_columnar_catalog later).",
+        )
+
+    def handle(self, *args, **options):
+        if options["rows"] < 1:
+            raise CommandError("--rows must be positive")
+        categories = options["categories"]
+
+        if options["truncate"]:
+            try:
+                clear_catalog(categories, detach_saved_builds=options["detach_saved_builds"])
+            except ValueError as e:
+                raise CommandError(f"{e}; pass --detach-saved-builds to clear those parts of the builds")
+
+        for category in categories:
+            start = time.perf_counter()
+            start_id = next_id(category)
+            generate_category(
+                category,
+                options["rows"],
+                seed=options["seed"],
+                batch_size=options["batch_size"],
+                start_id=start_id,
+            )
+            elapsed = time.perf_counter() - start
+            evict_fragments(category)
+            self.stdout.write(
+                f"{category}: ids {start_id}..{start_id + options['rows'] - 1} in {elapsed:.1f}s"
+            )
+
+        if not options["no_specs"]:
+            for category in categories:
+                if category in SPEC_MAP:
+                    refresh_specs(category)
+
+        version = bump_catalog_version()
+        self.stdout.write(f"catalog version: {version}")
+        if not options["no_columnar"]:
+            self.stdout.write(f"columnar catalog: {ensure_columnar_catalog(version)}")
@@ -0,0 +1,54 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from main.loadtest import run_load
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay simulated browsing sessions against a running server (runserver, "
+        "gunicorn or an ASGI server) and report throughput and latency per endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users.")
+        parser.add_argument("--duration", type=float, default=30, help="Seconds to run.")
+        parser.add_argument("--think-time", type=float, default=0.0, help="Max pause between steps, seconds.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--username", help="Log every user in as this account instead of registering.")
+        parser.add_argument("--password")
+        parser.add_argument("--output", help="Write the summary to this JSON file.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['users']} users for {options['duration']}s against {options['url']}..."
+        )
+        summary = run_load(
+            options["url"],
+            users=options["users"],
+            duration=options["duration"],
+            think_time=options["think_time"],
+            seed=options["seed"],
+            username=options["username"],
+            password=options["password"],
+        )
+
+        self.stdout.write(
+            f"{'endpoint':28} {'requests':>9} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+        )
+        for endpoint, s in summary["endpoints"].items():
+            self.stdout.write(
+                f"{endpoint:28} {s['requests']:9} {s['rps']:8.1f} {s['p50_ms']:9.1f} "
+                f"{s['p95_ms']:9.1f} {s['p99_ms']:9.1f} {s['error_rate']:7.1%}"
+            )
+        self.stdout.write(
+            f"total: {summary['requests']} requests, {summary['rps']:.1f} req/s, "
+            f"{summary['error_rate']:.1%} errors"
+        )
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+            self.stdout.write(f"summary written to {options['output']}")
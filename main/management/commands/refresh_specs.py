@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.catalog import bump_catalog_version
+from main.columnar import ensure_columnar_catalog
+from main.fragments import evict_fragments
+from main.specs import SPEC_MAP, refresh_specs
+
+
+class Command(BaseCommand):
+    help = "Rebuild the normalized spec tables from the raw catalog tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "categories", nargs="*",
+            help=f"Categories to refresh (default: all of {', '.join(SPEC_MAP)}).",
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--no-columnar", action="store_true",
+            help="Do not write the columnar catalog for the new version (run build_columnar_catalog later).",
+        )
+
+    def handle(self, *args, **options):
+        categories = options["categories"] or list(SPEC_MAP)
+        unknown = [c for c in categories if c not in SPEC_MAP]
+        if unknown:
+            raise CommandError(f"Unknown categories: {', '.join(unknown)}")
+
+        for category in categories:
+            count = refresh_specs(category, batch_size=options["batch_size"])
+            evict_fragments(category)
+            self.stdout.write(f"{category}: {count} rows")
+
+        version = bump_catalog_version()
+        self.stdout.write(f"catalog version: {version}")
+        if not options["no_columnar"]:
+            self.stdout.write(f"columnar catalog: {ensure_columnar_catalog(version)}")
@@ -0,0 +1,99 @@
+import json
+import subprocess
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from main.benchmarks import run_suite
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_sizes(value):
+    sizes = []
+    for part in value.split(","):
+        part = part.strip().lower()
+        multiplier = 1
+        if part.endswith("k"):
+            part, multiplier = part[:-1], 1_000
+        elif part.endswith("m"):
+            part, multiplier = part[:-1], 1_000_000
+        try:
+            sizes.append(int(part) * multiplier)
+        except ValueError:
+            raise CommandError(f"Bad size: {part!r}")
+    return sizes
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the compatibility filters and hot views on synthetic catalogs in a "
+        "throwaway test database and write the results to a JSON file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1k,100k", help="Rows per category, e.g. 1k,100k,1m.")
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--only", help="Run only benchmarks whose name contains this string.")
+        parser.add_argument("--output", default="bench_results.json")
+        parser.add_argument("--compare", help="Previous results file to diff against.")
+
+    def handle(self, *args, **options):
+        sizes = _parse_sizes(options["sizes"])
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = run_suite(
+                sizes,
+                repeat=options["repeat"],
+                seed=options["seed"],
+                only=options["only"],
+                log=self.stdout.write,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            "revision": _git_revision(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "database": connection.vendor,
+            "repeat": options["repeat"],
+            "results": results,
+        }
+        with open(options["output"], "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        self.stdout.write(f"results written to {options['output']}")
+
+        if options["compare"]:
+            self.compare(options["compare"], results)
+
+    def compare(self, path, results):
+        with open(path, encoding="utf-8") as f:
+            previous = json.load(f)
+        before = {(r["name"], r["rows"]): r for r in previous["results"]}
+
+        self.stdout.write(f"compared with {previous.get('revision') or path}:")
+        for result in results:
+            old = before.get((result["name"], result["rows"]))
+            if old is None:
+                continue
+            change = (result["wall_ms"] - old["wall_ms"]) / old["wall_ms"] * 100 if old["wall_ms"] else 0.0
+            self.stdout.write(
+                f"  {result['name']:45} {result['rows']:>9} "
+                f"{old['wall_ms']:10.3f} -> {result['wall_ms']:10.3f} ms ({change:+6.1f}%) "
+                f"{old['queries']:4} -> {result['queries']:4} q"
+            )
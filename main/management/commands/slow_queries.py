@@ -0,0 +1,43 @@
+import shutil
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main.querylog import load_query_logs
+
+SORT_KEYS = ("total", "count", "p99", "max")
+
+
+class Command(BaseCommand):
+    help = "Print the most expensive SQL fingerprints collected by the query log."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sort", choices=SORT_KEYS, default="total")
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument(
+            "--explain", action="store_true",
+            help="Print the plan captured for slow queries (a SLOW_QUERY_EXPLAIN_RATE sample of them).",
+        )
+        parser.add_argument("--reset", action="store_true", help="Delete the collected logs.")
+
+    def handle(self, *args, **options):
+        if options["reset"]:
+            shutil.rmtree(settings.QUERY_LOG_DIR, ignore_errors=True)
+            self.stdout.write("query log cleared")
+            return
+
+        stats = load_query_logs()
+        if not stats:
+            self.stdout.write(f"no queries recorded in {settings.QUERY_LOG_DIR}")
+            return
+
+        ranked = sorted(stats.items(), key=lambda item: item[1][options["sort"]], reverse=True)
+        for fingerprint, s in ranked[:options["limit"]]:
+            self.stdout.write(
+                f"{s['count']:8} calls {s['total'] * 1000:12.1f} ms total "
+                f"{s['p99'] * 1000:9.2f} ms p99 {s['max'] * 1000:9.2f} ms max"
+            )
+            self.stdout.write(f"    {fingerprint}")
+            if options["explain"] and s.get("plan"):
+                for line in s["plan"].splitlines():
+                    self.stdout.write(f"      | {line}")
@@ -0,0 +1,124 @@
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                # per-bucket counts (last one is +Inf), sum, count
+                series = self._series[label] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {label: ([*s[0]], s[1], s[2]) for label, s in self._series.items()}
+
+    def render(self, label_name):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label, (counts, total, count) in sorted(self.snapshot().items()):
+            label = _escape(label)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_name}="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_name}="{label}",le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{label_name}="{label}"}} {total}')
+            lines.append(f'{self.name}_count{{{label_name}="{label}"}} {count}')
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_duration = Histogram(
+    "pcbuilder_request_duration_seconds", "Total time spent handling the request.", DURATION_BUCKETS,
+)
+db_duration = Histogram(
+    "pcbuilder_db_duration_seconds", "Time spent in database queries per request.", DURATION_BUCKETS,
+)
+db_queries = Histogram(
+    "pcbuilder_db_queries", "Database queries executed per request.", QUERY_COUNT_BUCKETS,
+)
+template_duration = Histogram(
+    "pcbuilder_template_duration_seconds", "Time spent rendering templates per request.", DURATION_BUCKETS,
+)
+response_size = Histogram(
+    "pcbuilder_response_size_bytes", "Size of the response body.", SIZE_BUCKETS,
+)
+
+REQUEST_HISTOGRAMS = (request_duration, db_duration, db_queries, template_duration, response_size)
+
+
+def observe_request(view, stats, response_bytes):
+    request_duration.observe(view, stats.total_time)
+    db_duration.observe(view, stats.db_time)
+    db_queries.observe(view, stats.queries)
+    template_duration.observe(view, stats.template_time)
+    if response_bytes is not None:
+        response_size.observe(view, response_bytes)
+
+
+class EventCounter:
+    """Event counts that can be bumped from several threads at once
+    (``counter[event] += 1`` on a Counter can lose increments)."""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def incr(self, event, amount=1):
+        with self._lock:
+            self._counts[event] += amount
+
+    def __getitem__(self, event):
+        return self._counts[event]
+
+    def items(self):
+        with self._lock:
+            return list(self._counts.items())
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+
+cache_events = {}
+
+
+def cache_counter(name):
+    return cache_events.setdefault(name, EventCounter())
+
+
+def render_cache_events():
+    lines = [
+        "# HELP pcbuilder_cache_events_total In-process cache hits, misses and evictions.",
+        "# TYPE pcbuilder_cache_events_total counter",
+    ]
+    for name, counter in sorted(cache_events.items()):
+        for event, count in sorted(counter.items()):
+            lines.append(f'pcbuilder_cache_events_total{{cache="{_escape(name)}",event="{_escape(event)}"}} {count}')
+    return "\n".join(lines)
+
+
+def render_prometheus():
+    blocks = [h.render("view") for h in REQUEST_HISTOGRAMS]
+    blocks.append(render_cache_events())
+    return "\n".join(blocks) + "\n"
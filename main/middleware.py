@@ -0,0 +1,148 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from .build import BuildContext
+from .instrumentation import RequestStats, current_stats
+from .metrics import observe_request
+from .profiling import make_profiler, save_profile
+
+
+def _view_label(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    return match.view_name or match._func_path
+
+
+class PerformanceMiddleware:
+    """Times every request and reports it via Server-Timing and /metrics/."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.report(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.report(request, response, stats)
+
+    def report(self, request, response, stats):
+        stats.finish()
+        size = None if response.streaming else len(response.content)
+        observe_request(_view_label(request), stats, size)
+        response["Server-Timing"] = (
+            f"total;dur={stats.total_time * 1000:.2f}, "
+            f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries", '
+            f"tpl;dur={stats.template_time * 1000:.2f}"
+        )
+        return response
+
+
+_PROFILE_MODES = {"1": "sampling", "sampling": "sampling", "cprofile": "cprofile"}
+
+
+def profile_mode(request):
+    """The profiler asked for by ?_profile= or X-Profile, or None."""
+    value = request.GET.get("_profile") or request.headers.get("X-Profile") or ""
+    return _PROFILE_MODES.get(value.strip().lower())
+
+
+class ProfilingMiddleware:
+    """Profiles a single view call when a staff user asks for it.
+
+    Trigger with ``?_profile=1`` (sampling) / ``?_profile=cprofile`` or the
+    ``X-Profile`` header; any other value (``?_profile=0``) is ignored. The
+    result lands in PROFILE_DIR. Async views are profiled when served over
+    ASGI, on the event loop thread, so work from concurrent requests can
+    show up in their profiles.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Django wraps a synchronous process_view in sync_to_async, which
+            # would cost every request a thread hop.
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        mode = profile_mode(request)
+        if mode is None or not request.user.is_staff:
+            return None
+        if iscoroutinefunction(view_func):
+            # Under WSGI the coroutine runs on another thread's event loop,
+            # where neither profiler can see it.
+            return None
+        return self.profile(request, mode, view_func, view_args, view_kwargs)
+
+    def profile(self, request, mode, view_func, view_args, view_kwargs):
+        profiler = make_profiler(mode)
+        started = time.perf_counter()
+        with profiler:
+            response = view_func(request, *view_args, **view_kwargs)
+            if hasattr(response, "render") and callable(response.render):
+                response = response.render()
+        elapsed = time.perf_counter() - started
+
+        build = BuildContext.for_request(request).ids
+        return self.finish(request, response, profiler, mode, elapsed, view_kwargs, build, request.user)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        mode = profile_mode(request)
+        if mode is None:
+            return None
+        user = await request.auser()
+        if not user.is_staff:
+            return None
+        if not iscoroutinefunction(view_func):
+            # Sync views run in a worker thread; profile them there.
+            return await sync_to_async(self.profile)(request, mode, view_func, view_args, view_kwargs)
+
+        profiler = make_profiler(mode)
+        started = time.perf_counter()
+        with profiler:
+            response = await view_func(request, *view_args, **view_kwargs)
+        elapsed = time.perf_counter() - started
+
+        build = (await BuildContext.afor_request(request)).ids
+        return await sync_to_async(self.finish)(request, response, profiler, mode, elapsed, view_kwargs, build, user)
+
+    def finish(self, request, response, profiler, mode, elapsed, view_kwargs, build, user):
+        name = save_profile(profiler, {
+            "view": _view_label(request),
+            "path": request.get_full_path(),
+            "category": view_kwargs.get("category"),
+            "build": build,
+            "user": user.get_username(),
+            "mode": mode,
+            "duration_ms": round(elapsed * 1000, 3),
+        })
+        response["X-Profile-Id"] = name
+        return response
+
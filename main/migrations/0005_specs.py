@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_powersupply'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaseSpec',
+            fields=[
+                ('case', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='spec', serialize=False, to='main.case')),
+                ('form_factor_rank', models.IntegerField(blank=True, db_index=True, null=True)),
+            ],
+            options={
+                'db_table': 'case_spec',
+            },
+        ),
+        migrations.CreateModel(
+            name='CpuSpec',
+            fields=[
+                ('cpu', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='spec', serialize=False, to='main.cpu')),
+                ('core_clock_ghz', models.FloatField(blank=True, null=True)),
+                ('boost_clock_ghz', models.FloatField(blank=True, null=True)),
+                ('power_draw', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'cpu_spec',
+            },
+        ),
+        migrations.CreateModel(
+            name='InternalHardDriveSpec',
+            fields=[
+                ('hdd', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='spec', serialize=False, to='main.internalharddrive')),
+                ('power_draw', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'internal_hard_drive_spec',
+            },
+        ),
+        migrations.CreateModel(
+            name='MemorySpec',
+            fields=[
+                ('memory', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='spec', serialize=False, to='main.memory')),
+                ('module_count', models.IntegerField(blank=True, null=True)),
+                ('capacity_gb', models.IntegerField(blank=True, db_index=True, null=True)),
+                ('power_draw', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'memory_spec',
+            },
+        ),
+        migrations.CreateModel(
+            name='MotherboardSpec',
+            fields=[
+                ('motherboard', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='spec', serialize=False, to='main.motherboard')),
+                ('form_factor_rank', models.IntegerField(blank=True, db_index=True, null=True)),
+            ],
+            options={
+                'db_table': 'motherboard_spec',
+            },
+        ),
+        migrations.CreateModel(
+            name='VideoCardSpec',
+            fields=[
+                ('video_card', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='spec', serialize=False, to='main.videocard')),
+                ('memory_gb', models.IntegerField(blank=True, null=True)),
+                ('core_clock_ghz', models.FloatField(blank=True, null=True)),
+                ('boost_clock_ghz', models.FloatField(blank=True, null=True)),
+                ('power_draw', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'video_card_spec',
+            },
+        ),
+    ]
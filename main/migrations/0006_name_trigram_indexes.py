@@ -0,0 +1,46 @@
+from django.db import migrations
+
+CATALOG_TABLES = (
+    "cpu",
+    "motherboard",
+    "memory",
+    "case",
+    "cpu_cooler",
+    "internal_hard_drive",
+    "os",
+    "video_card",
+    "power_supply",
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+    existing = set(connection.introspection.table_names())
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table in CATALOG_TABLES:
+        if table not in existing:
+            continue
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{table}_name_trgm" '
+            f'ON "{table}" USING gin (name gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table in CATALOG_TABLES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{table}_name_trgm"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_specs'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -125,3 +125,87 @@ class Os(models.Model):
     class Meta:
         managed = False
         db_table = 'os'
+
+
+class CpuSpec(models.Model):
+    cpu = models.OneToOneField(
+        Cpu, on_delete=models.DO_NOTHING, primary_key=True,
+        db_constraint=False, related_name="spec",
+    )
+    core_clock_ghz = models.FloatField(blank=True, null=True)
+    boost_clock_ghz = models.FloatField(blank=True, null=True)
+    power_draw = models.IntegerField()
+
+    class Meta:
+        db_table = "cpu_spec"
+
+
+class VideoCardSpec(models.Model):
+    video_card = models.OneToOneField(
+        VideoCard, on_delete=models.DO_NOTHING, primary_key=True,
+        db_constraint=False, related_name="spec",
+    )
+    memory_gb = models.IntegerField(blank=True, null=True)
+    core_clock_ghz = models.FloatField(blank=True, null=True)
+    boost_clock_ghz = models.FloatField(blank=True, null=True)
+    power_draw = models.IntegerField()
+
+    class Meta:
+        db_table = "video_card_spec"
+
+
+class CaseSpec(models.Model):
+    case = models.OneToOneField(
+        Case, on_delete=models.DO_NOTHING, primary_key=True,
+        db_constraint=False, related_name="spec",
+    )
+    form_factor_rank = models.IntegerField(blank=True, null=True, db_index=True)
+
+    class Meta:
+        db_table = "case_spec"
+
+
+class MotherboardSpec(models.Model):
+    motherboard = models.OneToOneField(
+        Motherboard, on_delete=models.DO_NOTHING, primary_key=True,
+        db_constraint=False, related_name="spec",
+    )
+    form_factor_rank = models.IntegerField(blank=True, null=True, db_index=True)
+
+    class Meta:
+        db_table = "motherboard_spec"
+
+
+class MemorySpec(models.Model):
+    memory = models.OneToOneField(
+        Memory, on_delete=models.DO_NOTHING, primary_key=True,
+        db_constraint=False, related_name="spec",
+    )
+    module_count = models.IntegerField(blank=True, null=True)
+    capacity_gb = models.IntegerField(blank=True, null=True, db_index=True)
+    power_draw = models.IntegerField()
+
+    class Meta:
+        db_table = "memory_spec"
+
+
+class InternalHardDriveSpec(models.Model):
+    hdd = models.OneToOneField(
+        InternalHardDrive, on_delete=models.DO_NOTHING, primary_key=True,
+        db_constraint=False, related_name="spec",
+    )
+    power_draw = models.IntegerField()
+
+    class Meta:
+        db_table = "internal_hard_drive_spec"
+
+
+class CatalogVersion(models.Model):
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "catalog_version"
+
+    def __str__(self):
+        return f"Catalog v{self.version}"
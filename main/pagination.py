@@ -0,0 +1,118 @@
+import base64
+import json
+from bisect import bisect_right
+
+from django.conf import settings
+from django.db.models import Q, TextField, Value
+from django.db.models.functions import Coalesce
+
+SORT_KEYS = ("id", "name")
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e))
+    if not isinstance(values, list) or not values:
+        raise InvalidCursor("cursor must be a non-empty list")
+    return values
+
+
+def page_size_from_request(request):
+    default = settings.CATALOG_PAGE_SIZE
+    try:
+        size = int(request.GET.get("size", default))
+    except ValueError:
+        return default
+    return max(1, min(size, settings.CATALOG_MAX_PAGE_SIZE))
+
+
+def _keyset_queryset(queryset, size, after, sort):
+    if sort not in SORT_KEYS:
+        raise InvalidCursor(f"unsupported sort key: {sort}")
+
+    if sort == "id":
+        queryset = queryset.order_by("id")
+        if after is not None:
+            queryset = queryset.filter(id__gt=_cursor_id(after[-1]))
+    else:
+        # NULL names would break the (key, id) comparison, sort them as "".
+        queryset = queryset.alias(sort_key=Coalesce(sort, Value(""), output_field=TextField())).order_by("sort_key", "id")
+        if after is not None:
+            if len(after) != 2 or not isinstance(after[0], str):
+                raise InvalidCursor("cursor does not match sort key")
+            key, last_id = after[0], _cursor_id(after[1])
+            queryset = queryset.filter(Q(sort_key__gt=key) | Q(sort_key=key, id__gt=last_id))
+
+    return queryset[:size + 1]
+
+
+def _keyset_result(items, size, sort):
+    next_cursor = None
+    if len(items) > size:
+        items = items[:size]
+        last = items[-1]
+        if sort == "id":
+            next_cursor = encode_cursor([last.id])
+        else:
+            next_cursor = encode_cursor([getattr(last, sort) or "", last.id])
+    return items, next_cursor
+
+
+def _id_page(ids, size, after):
+    # ids: every matching id in ascending order (a catalog index lookup), so
+    # the page is a bisect and the query only fetches its rows by primary key.
+    start = bisect_right(ids, _cursor_id(after[-1])) if after is not None else 0
+    page = list(ids[start:start + size])
+    next_cursor = encode_cursor([page[-1]]) if start + size < len(ids) else None
+    return page, next_cursor
+
+
+def keyset_page(queryset, size, after=None, sort="id", ids=None):
+    if ids is not None and sort == "id":
+        page, next_cursor = _id_page(ids, size, after)
+        return (list(queryset.filter(id__in=page).order_by("id")) if page else []), next_cursor
+    items = list(_keyset_queryset(queryset, size, after, sort))
+    return _keyset_result(items, size, sort)
+
+
+async def akeyset_page(queryset, size, after=None, sort="id", ids=None):
+    if ids is not None and sort == "id":
+        page, next_cursor = _id_page(ids, size, after)
+        return ([item async for item in queryset.filter(id__in=page).order_by("id")] if page else []), next_cursor
+    items = [item async for item in _keyset_queryset(queryset, size, after, sort)]
+    return _keyset_result(items, size, sort)
+
+
+def _cursor_id(value):
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise InvalidCursor("cursor id must be an integer")
+    return value
+
+
+def _page_args(request):
+    sort = request.GET.get("sort", "id")
+    cursor = request.GET.get("after")
+    after = decode_cursor(cursor) if cursor else None
+    return page_size_from_request(request), after, sort
+
+
+def keyset_page_from_request(request, queryset, ids=None):
+    size, after, sort = _page_args(request)
+    return keyset_page(queryset, size, after=after, sort=sort, ids=ids)
+
+
+async def akeyset_page_from_request(request, queryset, ids=None):
+    size, after, sort = _page_args(request)
+    return await akeyset_page(queryset, size, after=after, sort=sort, ids=ids)
@@ -0,0 +1,104 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    base = str(settings.BASE_DIR)
+    if filename.startswith(base):
+        filename = os.path.relpath(filename, base)
+    elif "site-packages" in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """Samples one thread's stack from a helper thread; output is collapsed stacks."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.samples = Counter()
+        self._target = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        path = path.with_suffix(".collapsed")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+class DeterministicProfiler:
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def __enter__(self):
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.disable()
+
+    def write(self, path):
+        path = path.with_suffix(".prof")
+        self.profile.dump_stats(path)
+        return path
+
+
+def make_profiler(mode):
+    if mode == "cprofile":
+        return DeterministicProfiler()
+    return SamplingProfiler(settings.PROFILE_SAMPLE_INTERVAL)
+
+
+def save_profile(profiler, metadata):
+    directory = Path(settings.PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    view = metadata.get("view", "view").replace(":", "-")
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{view}-{uuid.uuid4().hex[:8]}"
+    output = profiler.write(directory / name)
+    metadata = {**metadata, "profile": output.name}
+    with open(directory / f"{name}.json", "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+
+    prune_profiles(directory, settings.PROFILE_MAX_FILES)
+    return name
+
+
+def prune_profiles(directory, keep):
+    profiles = sorted(directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for meta in profiles[keep:]:
+        for sibling in directory.glob(f"{meta.stem}.*"):
+            sibling.unlink(missing_ok=True)
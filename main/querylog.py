@@ -0,0 +1,208 @@
+import json
+import os
+import queue
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+_explaining = ContextVar("explaining_query", default=False)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _IN_LIST.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class QueryStats:
+    __slots__ = ("count", "total", "max", "samples", "example", "plan")
+
+    def __init__(self, sample_size):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=sample_size)
+        self.example = None
+        # Parameter values are never kept (they can be session keys,
+        # password hashes or emails); a sampled plan is captured instead.
+        self.plan = None
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "samples": list(self.samples),
+            "example": self.example,
+            "plan": self.plan,
+        }
+
+
+class QueryLog:
+    """Per-process aggregates keyed by SQL fingerprint, flushed to QUERY_LOG_DIR."""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        # Slow queries waiting for EXPLAIN; the params only live here, in
+        # memory, until the explainer thread has run them.
+        self._pending = queue.Queue(maxsize=16)
+        self._explainer = None
+
+    def record(self, sql, params, many, elapsed, connection):
+        key = fingerprint(sql)
+        slow = elapsed * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS
+        explain_it = False
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = QueryStats(settings.QUERY_LOG_SAMPLES)
+            stats.count += 1
+            stats.total += elapsed
+            stats.samples.append(elapsed)
+            if elapsed > stats.max:
+                stats.max = elapsed
+                stats.example = sql
+                explain_it = slow and not many and random.random() < settings.SLOW_QUERY_EXPLAIN_RATE
+        if explain_it:
+            self._queue_explain(key, connection.alias, sql, params)
+        self.maybe_flush()
+
+    def _queue_explain(self, key, alias, sql, params):
+        try:
+            self._pending.put_nowait((key, alias, sql, tuple(params or ())))
+        except queue.Full:
+            return
+        self._start_explainer()
+
+    def _start_explainer(self):
+        with self._lock:
+            if self._explainer is None or not self._explainer.is_alive():
+                self._explainer = threading.Thread(target=self._explain_forever, name="querylog-explain", daemon=True)
+                self._explainer.start()
+
+    def _explain_forever(self):
+        while True:
+            self._explain(*self._pending.get())
+            if self._pending.empty():
+                # This thread's own connections; don't hold them between slow queries.
+                connections.close_all()
+
+    def explain_pending(self):
+        """Run the queued EXPLAINs in the calling thread."""
+        while True:
+            try:
+                item = self._pending.get_nowait()
+            except queue.Empty:
+                return
+            self._explain(*item)
+
+    def _explain(self, key, alias, sql, params):
+        plan = explain(connections[alias], sql, params)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is not None:
+                stats.plan = plan
+
+    def snapshot(self):
+        with self._lock:
+            return {key: stats.as_dict() for key, stats in self._stats.items()}
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+    def maybe_flush(self):
+        if time.monotonic() - self._flushed_at < settings.QUERY_LOG_FLUSH_INTERVAL:
+            return
+        # Another thread is already writing this process's file.
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() - self._flushed_at >= settings.QUERY_LOG_FLUSH_INTERVAL:
+                self._write()
+        finally:
+            self._flush_lock.release()
+
+    def flush(self):
+        with self._flush_lock:
+            self._write()
+
+    def _write(self):
+        self._flushed_at = time.monotonic()
+        directory = Path(settings.QUERY_LOG_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"queries-{os.getpid()}.json"
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=directory, prefix=f"{path.stem}-", suffix=".tmp", delete=False,
+        ) as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False)
+        os.replace(f.name, path)
+
+
+def explain(connection, sql, params):
+    if not sql.lstrip().upper().startswith("SELECT"):
+        return None
+    token = _explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            return "\n".join(" ".join(str(col) for col in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f"EXPLAIN failed: {e}"
+    finally:
+        _explaining.reset(token)
+
+
+def load_query_logs(directory=None):
+    merged = {}
+    for path in Path(directory or settings.QUERY_LOG_DIR).glob("queries-*.json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for key, stats in data.items():
+            target = merged.get(key)
+            if target is None:
+                merged[key] = stats
+                continue
+            target["count"] += stats["count"]
+            target["total"] += stats["total"]
+            target["samples"] += stats["samples"]
+            if stats["max"] > target["max"]:
+                target["max"] = stats["max"]
+                target["example"] = stats["example"]
+            # The plan of the slowest example that has one.
+            if stats["plan"] is not None and (target["plan"] is None or stats["max"] >= target["max"]):
+                target["plan"] = stats["plan"]
+    for stats in merged.values():
+        stats["p99"] = percentile(stats.pop("samples"), 0.99)
+    return merged
+
+
+query_log = QueryLog()
@@ -0,0 +1,34 @@
+# Fields each category's read model carries besides id and name: what the
+# compatibility checks in compatibility.py read.
+RECORD_FIELDS = {
+    "cpu": ("socket", "tdp", "core_clock", "boost_clock"),
+    "motherboard": ("socket", "form_factor", "max_memory"),
+    "memory": ("modules",),
+    "case": ("type",),
+    "cpu_cooler": (),
+    "hdd": ("type",),
+    "os": ("max_memory",),
+    "video_card": ("memory",),
+    "powersupply": ("wattage",),
+}
+
+# Precomputed spec columns the checks prefer over parsing the text fields,
+# carried as spec__<field> (NULL when the component has no spec row).
+RECORD_SPEC_FIELDS = {
+    "cpu": ("power_draw",),
+    "motherboard": ("form_factor_rank",),
+    "memory": ("capacity_gb", "power_draw"),
+    "case": ("form_factor_rank",),
+    "hdd": ("power_draw",),
+    "video_card": ("power_draw",),
+}
+
+
+def record_fields(category):
+    spec_fields = (f"spec__{field}" for field in RECORD_SPEC_FIELDS.get(category, ()))
+    return ("id", "name", *RECORD_FIELDS[category], *spec_fields)
+
+
+def component_records(queryset, category):
+    """Rows as namedtuples (no __dict__, no model instantiation) instead of models."""
+    return queryset.values_list(*record_fields(category), named=True)
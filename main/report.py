@@ -0,0 +1,108 @@
+import threading
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .build import BUILD_CATEGORIES
+from .catalog import catalog
+from .compatibility import (
+    COMPATIBILITY_RULES,
+    estimate_build_power,
+    evaluate_rule,
+    required_psu_wattage,
+)
+
+_STATUS = {True: "pass", False: "fail", None: "skipped"}
+
+
+class BoundedLRU:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.stats["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_report_cache = None
+_report_cache_lock = threading.Lock()
+
+
+def report_cache():
+    # Created on first use so COMPATIBILITY_REPORT_CACHE_SIZE is read once
+    # settings are configured, not when this module is imported.
+    global _report_cache
+    if _report_cache is None:
+        with _report_cache_lock:
+            if _report_cache is None:
+                _report_cache = BoundedLRU(settings.COMPATIBILITY_REPORT_CACHE_SIZE)
+    return _report_cache
+
+
+@receiver(setting_changed)
+def _resize_report_cache(setting, **kwargs):
+    global _report_cache
+    if setting == "COMPATIBILITY_REPORT_CACHE_SIZE":
+        _report_cache = None
+
+
+def build_report(components):
+    cpu = components.get("cpu")
+    gpu = components.get("video_card")
+    memory = components.get("memory")
+    hdd = components.get("hdd")
+
+    rules = []
+    for rule in COMPATIBILITY_RULES:
+        rules.append({
+            "rule": rule.name,
+            "slots": list(rule.depends_on),
+            "status": _STATUS[evaluate_rule(rule, components)],
+        })
+    return {
+        "compatible": all(r["status"] != "fail" for r in rules),
+        "rules": rules,
+        "estimated_power": estimate_build_power(cpu, gpu, memory, hdd),
+        "required_psu_wattage": round(required_psu_wattage(cpu, gpu, memory, hdd)),
+    }
+
+
+def report_key(build):
+    return (catalog.version(),) + tuple(build.ids.get(cat) for cat in BUILD_CATEGORIES)
+
+
+def compatibility_report(build):
+    # Cached reports are shared between requests and must not be mutated.
+    key = report_key(build)
+    cache = report_cache()
+    report = cache.get(key)
+    if report is None:
+        report = build_report(build.components)
+        cache.put(key, report)
+    return report
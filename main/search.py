@@ -0,0 +1,250 @@
+import hashlib
+import re
+import threading
+from collections import defaultdict, namedtuple
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Lookup, Q, Value, When
+
+from .catalog import CATEGORY_MODELS, catalog
+from .compatibility import CANDIDATE_DEPENDS_ON, filter_compatible_candidates_qs
+from .metrics import cache_counter
+
+_WORD_RE = re.compile(r"\w+")
+
+# pg_trgm's default word_similarity_threshold.
+_MIN_SIMILARITY = 0.6
+
+# How many candidates a search looks at. The compatibility filter is applied
+# to all of them in one id__in query, so a filter that rejects most of them
+# costs one query, not one per window.
+MAX_CANDIDATES = 500
+
+
+def normalize(text):
+    return " ".join(_WORD_RE.findall((text or "").lower()))
+
+
+def trigrams(text):
+    grams = set()
+    for word in _WORD_RE.findall((text or "").lower()):
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class NgramIndex:
+    def __init__(self, rows):
+        self._names = {}
+        # Lowercased as stored, for plain substring matches.
+        self._lower = {}
+        postings = defaultdict(list)
+        for item_id, name in rows:
+            norm = normalize(name)
+            self._names[item_id] = norm
+            self._lower[item_id] = (name or "").lower()
+            for gram in trigrams(norm):
+                postings[gram].append(item_id)
+        self._postings = dict(postings)
+
+    def __len__(self):
+        return len(self._names)
+
+    def starts_word(self, item_id, query):
+        name = self._names[item_id]
+        return name.startswith(query) or f" {query}" in name
+
+    def contains(self, item_id, text):
+        return text in self._lower[item_id]
+
+    def containing(self, text, exclude=(), limit=None):
+        matches = (
+            item_id for item_id, name in self._lower.items()
+            if text in name and item_id not in exclude
+        )
+        return list(islice(matches, limit))
+
+    def ranked_ids(self, query):
+        return self.ranked(query)[0]
+
+    def ranked(self, query):
+        # (ids, how many of them are word-start matches; those come first)
+        query = normalize(query)
+        if not query:
+            return [], 0
+        grams = trigrams(query)
+
+        shared = defaultdict(int)
+        for gram in grams:
+            for item_id in self._postings.get(gram, ()):
+                shared[item_id] += 1
+
+        min_shared = max(1, int(len(grams) * _MIN_SIMILARITY))
+        scored = []
+        for item_id, count in shared.items():
+            prefix = self.starts_word(item_id, query)
+            if count < min_shared and not prefix:
+                continue
+            scored.append((not prefix, -count / len(grams), item_id))
+        scored.sort()
+        prefix_count = sum(1 for not_prefix, _, _ in scored if not not_prefix)
+        return [item_id for _, _, item_id in scored], prefix_count
+
+
+class NgramSearchBackend:
+    def __init__(self):
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def index_for(self, model_class):
+        version = catalog.version()
+        entry = self._indexes.get(model_class)
+        if entry is None or entry[0] != version:
+            with self._lock:
+                entry = self._indexes.get(model_class)
+                if entry is None or entry[0] != version:
+                    rows = model_class.objects.values_list("id", "name").iterator(chunk_size=5000)
+                    entry = (version, NgramIndex(rows))
+                    self._indexes[model_class] = entry
+        return entry[1]
+
+    def reset(self):
+        with self._lock:
+            self._indexes.clear()
+
+    def search(self, queryset, query, limit):
+        # Tiers: word-start matches, then plain substring matches (what
+        # ajax_search matched before ranking), then fuzzy trigram matches.
+        query = query.strip().lower()
+        index = self.index_for(queryset.model)
+        ranked, prefix_count = index.ranked(query)
+        candidates = ranked[:prefix_count]
+        if prefix_count < MAX_CANDIDATES and query:
+            rest = ranked[prefix_count:]
+            substring = [item_id for item_id in rest if index.contains(item_id, query)]
+            fuzzy = [item_id for item_id in rest if not index.contains(item_id, query)]
+            # Substrings inside a word ("700" in "5700X") share too few
+            # trigrams to be ranked; they go after the ranked substring matches.
+            candidates += substring
+            if len(candidates) < MAX_CANDIDATES:
+                candidates += index.containing(
+                    query, exclude=set(ranked), limit=MAX_CANDIDATES - len(candidates),
+                )
+            candidates += fuzzy
+        candidates = candidates[:MAX_CANDIDATES]
+
+        allowed = {}
+        if candidates:
+            allowed = {
+                row.id: row
+                for row in queryset.filter(id__in=candidates).values_list("id", "name", named=True)
+            }
+        return [allowed[i] for i in candidates if i in allowed][:limit]
+
+
+class ILike(Lookup):
+    # Plain ILIKE on the column. name__icontains compiles to
+    # UPPER("name") LIKE UPPER(%s), which the name gin_trgm_ops index
+    # cannot serve.
+    lookup_name = "ilike"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} ILIKE {rhs}", (*lhs_params, *rhs_params)
+
+
+def _like_pattern(text, prefix="%", suffix="%"):
+    return prefix + connection.ops.prep_for_like_query(text) + suffix
+
+
+class TrigramSearchBackend:
+    def matches(self, queryset, query):
+        from django.contrib.postgres.lookups import TrigramWordSimilar
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        # Every filter is an ILIKE or %> on the bare column, so the
+        # <table>_name_trgm index answers them (a BitmapOr of index scans);
+        # the word-start / substring / fuzzy tiers are only computed in
+        # ORDER BY for the rows that matched.
+        query = query.strip().lower()
+        norm = normalize(query)
+        infix = Q(ILike(F("name"), Value(_like_pattern(query))))
+        if not norm:
+            return queryset.filter(infix).order_by("id")
+        word_start = (
+            Q(ILike(F("name"), Value(_like_pattern(norm, prefix=""))))
+            | Q(ILike(F("name"), Value(_like_pattern(f" {norm}"))))
+        )
+        return queryset.filter(
+            word_start | infix | Q(TrigramWordSimilar(F("name"), Value(norm)))
+        ).annotate(
+            tier=Case(
+                When(word_start, then=Value(2)),
+                When(infix, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+            similarity=TrigramWordSimilarity(norm, "name"),
+        ).order_by("-tier", "-similarity", "id")
+
+    def search(self, queryset, query, limit):
+        return list(self.matches(queryset, query).values_list("id", "name", named=True)[:limit])
+
+    def reset(self):
+        pass
+
+
+_ngram_backend = NgramSearchBackend()
+_trigram_backend = TrigramSearchBackend()
+
+
+def get_backend():
+    if connection.vendor == "postgresql":
+        return _trigram_backend
+    return _ngram_backend
+
+
+def search(queryset, query, limit):
+    return get_backend().search(queryset, query, limit)
+
+
+SearchHit = namedtuple("SearchHit", ["id", "name"])
+
+search_cache_stats = cache_counter("search")
+
+
+def search_cache_key(category, query, limit, compatibility_on, build):
+    # Only the slots the category's compatibility filter reads matter; the
+    # catalog version retires every entry when the catalog changes.
+    selected = ()
+    if compatibility_on:
+        selected = tuple(build.ids.get(slot) for slot in CANDIDATE_DEPENDS_ON.get(category, ()))
+    parts = (catalog.version(), category, query.strip().lower(), limit, compatibility_on, selected)
+    return "search:" + hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def cached_search(category, query, limit, compatibility_on, build):
+    cache = caches["search"]
+    key = search_cache_key(category, query, limit, compatibility_on, build)
+    hits = cache.get(key)
+    if hits is not None:
+        search_cache_stats.incr("hits")
+    else:
+        search_cache_stats.incr("misses")
+        items = CATEGORY_MODELS[category].objects.all()
+        if compatibility_on:
+            items = filter_compatible_candidates_qs(category, items, build)
+        hits = [(item.id, item.name) for item in search(items, query, limit)]
+        cache.set(key, hits)
+    return [SearchHit(*hit) for hit in hits]
+
+
+async def acached_search(category, query, limit, compatibility_on, build):
+    # The n-gram index is built and scored in Python; keep that work (and its
+    # queries) off the event loop.
+    return await sync_to_async(cached_search)(category, query, limit, compatibility_on, build)
@@ -0,0 +1,105 @@
+from django.db import transaction
+
+from .compatibility import (
+    _parse_ghz,
+    _parse_gb,
+    estimate_cpu_power,
+    estimate_gpu_power,
+    estimate_memory_power,
+    estimate_drive_power,
+    parse_form_factor,
+    parse_memory_capacity,
+    parse_memory_modules,
+)
+from .models import (
+    Cpu,
+    CpuSpec,
+    VideoCard,
+    VideoCardSpec,
+    Case,
+    CaseSpec,
+    Motherboard,
+    MotherboardSpec,
+    Memory,
+    MemorySpec,
+    InternalHardDrive,
+    InternalHardDriveSpec,
+)
+
+
+def _cpu_spec(cpu):
+    return CpuSpec(
+        cpu_id=cpu.id,
+        core_clock_ghz=_parse_ghz(cpu.core_clock or ""),
+        boost_clock_ghz=_parse_ghz(cpu.boost_clock or ""),
+        power_draw=estimate_cpu_power(cpu),
+    )
+
+
+def _video_card_spec(gpu):
+    return VideoCardSpec(
+        video_card_id=gpu.id,
+        memory_gb=_parse_gb(gpu.memory or ""),
+        core_clock_ghz=_parse_ghz(gpu.core_clock or ""),
+        boost_clock_ghz=_parse_ghz(gpu.boost_clock or ""),
+        power_draw=estimate_gpu_power(gpu),
+    )
+
+
+def _case_spec(case):
+    return CaseSpec(
+        case_id=case.id,
+        form_factor_rank=parse_form_factor(case.type or ""),
+    )
+
+
+def _motherboard_spec(mb):
+    return MotherboardSpec(
+        motherboard_id=mb.id,
+        form_factor_rank=parse_form_factor(mb.form_factor or ""),
+    )
+
+
+def _memory_spec(memory):
+    return MemorySpec(
+        memory_id=memory.id,
+        module_count=parse_memory_modules(memory),
+        capacity_gb=parse_memory_capacity(memory),
+        power_draw=estimate_memory_power(memory),
+    )
+
+
+def _hdd_spec(hdd):
+    return InternalHardDriveSpec(
+        hdd_id=hdd.id,
+        power_draw=estimate_drive_power(hdd),
+    )
+
+
+SPEC_MAP = {
+    "cpu": (Cpu, CpuSpec, _cpu_spec),
+    "video_card": (VideoCard, VideoCardSpec, _video_card_spec),
+    "case": (Case, CaseSpec, _case_spec),
+    "motherboard": (Motherboard, MotherboardSpec, _motherboard_spec),
+    "memory": (Memory, MemorySpec, _memory_spec),
+    "hdd": (InternalHardDrive, InternalHardDriveSpec, _hdd_spec),
+}
+
+
+def refresh_specs(category, batch_size=2000):
+    model_class, spec_class, build_spec = SPEC_MAP[category]
+
+    created = 0
+    with transaction.atomic():
+        spec_class.objects.all().delete()
+        batch = []
+        for obj in model_class.objects.all().iterator(chunk_size=batch_size):
+            batch.append(build_spec(obj))
+            if len(batch) >= batch_size:
+                spec_class.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            spec_class.objects.bulk_create(batch)
+            created += len(batch)
+    return created
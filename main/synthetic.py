@@ -0,0 +1,260 @@
+import csv
+import io
+import random
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .catalog import CATEGORY_MODELS
+from .specs import SPEC_MAP
+
+SOCKETS = ("AM4", "AM5", "LGA1200", "LGA1700", "LGA1851", "sTRX4")
+# Spelled the way the source catalog spells them, including the variants
+# parse_form_factor does not recognise ("EATX", "Mini DTX", "HTPC").
+MOTHERBOARD_FORM_FACTORS = ("Mini ITX", "Micro ATX", "ATX", "EATX", "Extended ATX", "Mini DTX")
+CASE_TYPES = (
+    "Mini ITX Tower",
+    "Mini ITX Desktop",
+    "MicroATX Mini Tower",
+    "MicroATX Mid Tower",
+    "ATX Mid Tower",
+    "ATX Full Tower",
+    "Extended ATX Full Tower",
+    "HTPC",
+)
+COLORS = ("Black", "White", "Black / White", "Red", None)
+
+
+def ensure_catalog_tables():
+    # The catalog models are unmanaged; create their tables where they are
+    # missing (test and benchmark databases).
+    existing = set(connection.introspection.table_names())
+    with connection.schema_editor() as schema_editor:
+        for model in apps.get_app_config("main").get_models():
+            if not model._meta.managed and model._meta.db_table not in existing:
+                schema_editor.create_model(model)
+
+
+def _clock(rng, low, high):
+    ghz = rng.uniform(low, high)
+    style = rng.random()
+    if style < 0.7:
+        return f"{ghz:.1f} GHz"
+    if style < 0.85:
+        return f"{round(ghz * 1000)} MHz"
+    if style < 0.95:
+        return f"{ghz:.1f} GHz".replace(".", ",")
+    return None
+
+
+def _modules(rng, count, size):
+    style = rng.random()
+    if style < 0.75:
+        return f"{count} x {size}GB"
+    if style < 0.85:
+        return f"{count}x{size}GB"
+    if style < 0.92:
+        return f"{count} x {size} GB"
+    if style < 0.98:
+        return f"{count * size}GB"
+    return None
+
+
+def make_cpu(rng, i):
+    vendor = rng.choice(("AMD Ryzen", "Intel Core i"))
+    tier = rng.choice((3, 5, 7, 9))
+    return (
+        i,
+        f"{vendor}{'' if vendor.endswith('i') else ' '}{tier} {rng.randint(1000, 9999)}{rng.choice(('', 'X', 'K', 'F', 'X3D'))}",
+        rng.choice((4, 6, 8, 12, 16, 24)),
+        _clock(rng, 2.5, 4.0),
+        _clock(rng, 3.8, 5.8),
+        rng.choice((None, 35, 65, 105, 125, 170)),
+        rng.choice((None, "Radeon Vega 7", "Intel UHD Graphics 770")),
+        rng.choice((True, False)),
+        rng.choice(SOCKETS),
+    )
+
+
+def make_motherboard(rng, i):
+    return (
+        i,
+        f"{rng.choice(('ASUS', 'MSI', 'Gigabyte', 'ASRock'))} {rng.choice(('B550', 'X670E', 'Z790', 'B760'))}-{i}",
+        rng.choice(SOCKETS),
+        rng.choice(MOTHERBOARD_FORM_FACTORS),
+        rng.choice((None, 64, 128, 192, 256)),
+        rng.choice((2, 4, 8)),
+        rng.choice(COLORS),
+    )
+
+
+def make_memory(rng, i):
+    count = rng.choice((1, 2, 4))
+    size = rng.choice((4, 8, 16, 32))
+    return (
+        i,
+        f"{rng.choice(('Kingston FURY', 'Corsair Vengeance', 'G.Skill Trident Z5'))} {count * size}GB",
+        f"DDR{rng.choice((4, 5))}-{rng.choice((3200, 3600, 5600, 6000))}",
+        _modules(rng, count, size),
+        rng.choice(COLORS),
+        f"{rng.uniform(8, 12):.2f} ns",
+        str(rng.choice((16, 18, 30, 36))),
+    )
+
+
+def make_case(rng, i):
+    return (
+        i,
+        f"{rng.choice(('NZXT H', 'Fractal Design North ', 'Lian Li O11 '))}{i}",
+        rng.choice(CASE_TYPES),
+        rng.choice(COLORS),
+        rng.choice((None, "450 W", "650W")),
+        rng.choice(("Tempered Glass", "Mesh", None)),
+        rng.randint(0, 6),
+    )
+
+
+def make_cpu_cooler(rng, i):
+    return (
+        i,
+        f"{rng.choice(('Noctua NH-', 'be quiet! Dark Rock ', 'DeepCool AK'))}{i}",
+        f"{rng.randint(300, 900)} - {rng.randint(1200, 2500)} RPM",
+        f"{rng.uniform(15, 35):.1f} dB",
+        rng.choice(COLORS),
+        rng.choice((None, "120 mm", "240 mm", "360 mm")),
+    )
+
+
+def make_hdd(rng, i):
+    return (
+        i,
+        f"{rng.choice(('Samsung 990 Pro', 'WD Blue', 'Seagate Barracuda'))} {i}",
+        f"{rng.choice((500, 1000, 2000, 4000))} GB",
+        rng.choice(("SSD", "7200", "5400", "Hybrid", None)),
+        rng.choice((None, "64 MB", "256 MB")),
+        rng.choice(("M.2-2280", "2.5\"", "3.5\"")),
+        rng.choice(("M.2 PCIe 4.0 X4", "SATA 6.0 Gb/s")),
+    )
+
+
+def make_os(rng, i):
+    return (
+        i,
+        f"{rng.choice(('Microsoft Windows 11 Home', 'Microsoft Windows 11 Pro', 'Ubuntu'))} {i}",
+        rng.choice(("64-bit", "32/64-bit")),
+        rng.choice((None, 128, 2048)),
+    )
+
+
+def make_video_card(rng, i):
+    return (
+        i,
+        f"{rng.choice(('GeForce RTX', 'Radeon RX'))} {rng.choice((3060, 4070, 4090, 6700, 7900))} {i}",
+        rng.choice(("GeForce RTX 4070", "Radeon RX 7900 XTX")),
+        rng.choice((None, "4 GB", "8 GB", "12GB", "16 GB", "24 GB")),
+        _clock(rng, 1.5, 2.5),
+        _clock(rng, 1.8, 2.8),
+        rng.choice(COLORS),
+        f"{rng.randint(170, 340)} mm",
+    )
+
+
+def make_powersupply(rng, i):
+    return (
+        i,
+        f"{rng.choice(('Corsair RM', 'Seasonic FOCUS GX-', 'be quiet! Pure Power '))}{i}",
+        rng.choice(("ATX", "SFX")),
+        rng.choice(("bronze", "gold", "platinum", None)),
+        rng.choice((None, 450, 550, 650, 750, 850, 1000, 1200)),
+        rng.choice(("Full", "Semi", "No")),
+        rng.choice(COLORS),
+    )
+
+
+FACTORIES = {
+    "cpu": make_cpu,
+    "motherboard": make_motherboard,
+    "memory": make_memory,
+    "case": make_case,
+    "cpu_cooler": make_cpu_cooler,
+    "hdd": make_hdd,
+    "os": make_os,
+    "video_card": make_video_card,
+    "powersupply": make_powersupply,
+}
+
+
+def _columns(model_class):
+    return [f.column for f in model_class._meta.concrete_fields]
+
+
+def _copy_rows(model_class, rows):
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+    table = connection.ops.quote_name(model_class._meta.db_table)
+    columns = ", ".join(connection.ops.quote_name(c) for c in _columns(model_class))
+    statement = f"COPY {table} ({columns}) FROM STDIN"
+    with connection.cursor() as cursor:
+        if is_psycopg3:
+            with cursor.cursor.copy(statement) as copy:
+                for row in rows:
+                    copy.write_row(row)
+        else:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerows(rows)
+            buffer.seek(0)
+            cursor.cursor.copy_expert(f"{statement} WITH (FORMAT csv)", buffer)
+
+
+def _insert_rows(model_class, rows):
+    if connection.vendor == "postgresql":
+        _copy_rows(model_class, rows)
+        return
+    names = [f.attname for f in model_class._meta.concrete_fields]
+    model_class.objects.bulk_create([model_class(**dict(zip(names, row))) for row in rows])
+
+
+def clear_catalog(categories=None, detach_saved_builds=False):
+    from accounts.models import SavedBuild
+
+    categories = list(categories or CATEGORY_MODELS)
+    # Saved builds keep pointing at catalog rows. Detaching them (the way
+    # on_delete=SET_NULL would) loses users' data, so it has to be asked for.
+    in_use = Q(*(Q(**{f"{category}__isnull": False}) for category in categories), _connector=Q.OR)
+    with transaction.atomic():
+        if SavedBuild.objects.filter(in_use).exists():
+            if not detach_saved_builds:
+                raise ValueError("saved builds reference the catalog rows being cleared")
+            SavedBuild.objects.update(**{category: None for category in categories})
+        for category in categories:
+            # Spec rows of deleted components would otherwise be picked up
+            # by the new rows that reuse their ids.
+            if category in SPEC_MAP:
+                SPEC_MAP[category][1].objects.all().delete()
+        with connection.cursor() as cursor:
+            for category in categories:
+                table = connection.ops.quote_name(CATEGORY_MODELS[category]._meta.db_table)
+                cursor.execute(f"DELETE FROM {table}")
+
+
+def next_id(category):
+    last = CATEGORY_MODELS[category].objects.order_by("-id").values_list("id", flat=True).first()
+    return (last or 0) + 1
+
+
+def generate_category(category, rows, seed=0, batch_size=5000, start_id=1):
+    model_class = CATEGORY_MODELS[category]
+    factory = FACTORIES[category]
+    rng = random.Random(f"{seed}:{category}")
+    stop_id = start_id + rows
+    with transaction.atomic():
+        for start in range(start_id, stop_id, batch_size):
+            stop = min(start + batch_size, stop_id)
+            _insert_rows(model_class, [factory(rng, i) for i in range(start, stop)])
+
+
+def generate_catalog(rows, seed=0, categories=None, batch_size=5000):
+    for category in categories or CATEGORY_MODELS:
+        generate_category(category, rows, seed=seed, batch_size=batch_size)
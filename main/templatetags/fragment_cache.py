@@ -0,0 +1,32 @@
+from django import template
+
+from main.fragments import fragment_cache_key, get_fragment, set_fragment
+
+register = template.Library()
+
+
+class CachedFragmentNode(template.Node):
+    def __init__(self, nodelist, category, parts):
+        self.nodelist = nodelist
+        self.category = category
+        self.parts = parts
+
+    def render(self, context):
+        category = self.category.resolve(context)
+        key = fragment_cache_key(category, tuple(part.resolve(context) for part in self.parts))
+        html = get_fragment(key)
+        if html is None:
+            html = self.nodelist.render(context)
+            set_fragment(key, html)
+        return html
+
+
+@register.tag
+def cached_fragment(parser, token):
+    """{% cached_fragment category key_part ... %} ... {% endcached_fragment %}"""
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' needs at least a category.")
+    nodelist = parser.parse(("endcached_fragment",))
+    parser.delete_first_token()
+    return CachedFragmentNode(nodelist, parser.compile_filter(bits[1]), [parser.compile_filter(b) for b in bits[2:]])
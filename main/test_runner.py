@@ -0,0 +1,25 @@
+import tempfile
+from pathlib import Path
+
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class ScratchDirRunner(DiscoverRunner):
+    """Points the directories the app writes to at a temporary directory."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._scratch = tempfile.TemporaryDirectory(prefix="pc_builder-tests-")
+        root = Path(self._scratch.name)
+        self._scratch_settings = override_settings(
+            QUERY_LOG_DIR=root / "querylog",
+            PROFILE_DIR=root / "profiles",
+            COLUMNAR_CATALOG_DIR=root / "columnar",
+        )
+        self._scratch_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._scratch_settings.disable()
+        self._scratch.cleanup()
+        super().teardown_test_environment(**kwargs)
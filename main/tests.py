@@ -1,3 +1,1387 @@
-from django.test import TestCase
+import importlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import unittest
+from collections import namedtuple
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import SyncToAsync, async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.middleware.csrf import CsrfViewMiddleware
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils.http import http_date
+
+from accounts import urls as accounts_urls
+from accounts.models import SavedBuild
+from . import search as search_module
+from . import urls as main_urls
+from .build import BUILD_MAP, BuildContext
+from .compatibility import (
+    _spec,
+    case_form_factor_rank,
+    estimate_cpu_power,
+    estimate_drive_power,
+    estimate_gpu_power,
+    estimate_memory_power,
+    filter_compatible_candidates_qs,
+    filter_compatible_case_ids,
+    filter_compatible_cases_by_motherboard,
+    filter_compatible_cases_by_motherboard_qs,
+    filter_compatible_motherboard_ids,
+    filter_compatible_motherboards,
+    filter_compatible_motherboards_qs,
+    filter_compatible_psu,
+    filter_compatible_psu_qs,
+    is_case_compatible_with_motherboard,
+    is_compatible_cpu_motherboard,
+    is_powersupply_sufficient,
+    motherboard_form_factor_rank,
+    parse_memory_capacity,
+    required_psu_wattage,
+)
+from .catalog import CATEGORY_MODELS, CatalogCache, bump_catalog_version, catalog
+from .columnar import (
+    ColumnarCatalog,
+    ensure_columnar_catalog,
+    prune_columnar_catalogs,
+    shared_catalog,
+    write_columnar_catalog,
+)
+from .delta import STATE_SESSION_KEY, candidate_count
+from .fragments import evict_fragments, fragment_cache_key
+from .indexes import RankIndex
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_page
+from .metrics import db_queries, request_duration
+from .querylog import QueryLog, load_query_logs
+from .models import (
+    Case, CaseSpec, Cpu, CpuCooler, CpuSpec, InternalHardDrive, Memory, Motherboard, MotherboardSpec, Os, PowerSupply,
+    VideoCard,
+)
+from .records import component_records
+from .specs import SPEC_MAP, refresh_specs
+from .report import compatibility_report, report_cache
+from .search import (
+    MAX_CANDIDATES,
+    NgramSearchBackend,
+    TrigramSearchBackend,
+    cached_search,
+    get_backend,
+    search_cache_key,
+    search_cache_stats,
+)
+from .synthetic import clear_catalog, ensure_catalog_tables, generate_category
+
+
+def use_async_views(test, enabled=True):
+    """Route main.urls to the async (or sync) views for the rest of ``test``."""
+
+    def reload_urls():
+        importlib.reload(main_urls)
+        # The root URLconf's include() resolver caches main.urls' patterns.
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    with override_settings(ASYNC_VIEWS=enabled):
+        reload_urls()
+    test.addCleanup(reload_urls)
+
+
+class CatalogTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        ensure_catalog_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cpu = Cpu.objects.create(id=1, name="AMD Ryzen 5 5600X", socket="AM4", tdp=65)
+        cls.motherboard = Motherboard.objects.create(
+            id=1, name="ASUS PRIME B550-PLUS", socket="AM4", form_factor="ATX", max_memory=128,
+        )
+        cls.memory = Memory.objects.create(id=1, name="Kingston FURY 16GB", modules="2 x 8GB")
+        cls.case = Case.objects.create(id=1, name="NZXT H510", type="ATX Mid Tower")
+        cls.psu = PowerSupply.objects.create(id=1, name="Corsair RM750", wattage=750)
+        cls.user = User.objects.create_user(username="builder", password="secret")
+
+
+@override_settings(MY_BUILDS_PAGE_SIZE=5)
+class MyBuildsQueryCountTests(CatalogTestCase):
+    def create_builds(self, count):
+        for i in range(count):
+            SavedBuild.objects.create(
+                user=self.user,
+                build_name=f"Сборка {i}",
+                cpu=self.cpu,
+                motherboard=self.motherboard,
+                memory=self.memory,
+                case=self.case,
+                powersupply=self.psu,
+            )
+
+    def assert_my_builds_queries(self, build_count):
+        self.create_builds(build_count)
+        self.client.force_login(self.user)
+        # session, user, page count, page rows
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("main:my_builds"))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_query_count_does_not_grow_with_builds(self):
+        self.assert_my_builds_queries(1)
+
+    def test_query_count_with_full_page(self):
+        response = self.assert_my_builds_queries(12)
+        self.assertEqual(len(response.context["builds"]), 5)
+        self.assertContains(response, "AMD Ryzen 5 5600X", count=5)
+        self.assertContains(response, "Corsair RM750", count=5)
+
+    def test_other_pages(self):
+        self.create_builds(12)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("main:my_builds"), {"page": 3})
+        self.assertEqual(len(response.context["builds"]), 2)
+
+
+class CompatibilityQuerySetTests(CatalogTestCase):
+    """The *_qs filters must select exactly what the Python predicates accept."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i, (socket, form_factor) in enumerate((
+            ("LGA1700", "Micro ATX"),
+            ("AM4", "Mini ITX"),
+            (None, "ATX"),
+            ("AM5", "Extended ATX"),
+            ("AM4", "Mini-ITX"),
+            ("AM4", None),
+        ), 2):
+            Motherboard.objects.create(id=i, name=f"Board {i}", socket=socket, form_factor=form_factor)
+        for i, case_type in enumerate((
+            "Mini ITX Desktop", "Micro ATX Mini Tower", "MicroATX Mid Tower",
+            "Extended ATX Full Tower", "Open frame", None, "HTPC",
+        ), 2):
+            Case.objects.create(id=i, name=f"Case {i}", type=case_type)
+        # (65 + 50) * 1.5 = 172.5 W and (100 + 50) * 1.5 = 225 W.
+        for i, wattage in enumerate((None, 0, 172, 173, 224, 225, 226), 2):
+            PowerSupply.objects.create(id=i, name=f"PSU {i}", wattage=wattage)
+
+    def assertSameIds(self, python_result, queryset):
+        self.assertEqual(sorted(obj.id for obj in python_result), sorted(queryset.values_list("id", flat=True)))
+
+    def check_motherboards(self, motherboards):
+        for cpu in (self.cpu, Cpu(socket="LGA1700"), Cpu(socket=None), Cpu(socket="sTRX4")):
+            with self.subTest(socket=cpu.socket):
+                expected = filter_compatible_motherboards(cpu, motherboards)
+                self.assertEqual(expected, [mb for mb in motherboards if is_compatible_cpu_motherboard(cpu, mb)])
+                self.assertSameIds(expected, filter_compatible_motherboards_qs(cpu, Motherboard.objects.all()))
+
+    def check_cases(self, motherboards, cases):
+        for motherboard in motherboards:
+            with self.subTest(form_factor=motherboard.form_factor):
+                expected = filter_compatible_cases_by_motherboard(motherboard, cases)
+                self.assertEqual(
+                    expected, [case for case in cases if is_case_compatible_with_motherboard(motherboard, case)],
+                )
+                self.assertSameIds(expected, filter_compatible_cases_by_motherboard_qs(motherboard, Case.objects.all()))
+
+    def test_motherboards_by_socket(self):
+        self.check_motherboards(list(Motherboard.objects.all()))
+
+    def test_cases_by_form_factor_parsed_from_text(self):
+        self.check_cases(list(Motherboard.objects.all()), list(Case.objects.all()))
+
+    def test_cases_by_form_factor_from_specs(self):
+        refresh_specs("case")
+        refresh_specs("motherboard")
+        self.check_cases(
+            list(Motherboard.objects.select_related("spec")), list(Case.objects.select_related("spec")),
+        )
+
+    def test_psu_wattage_boundaries(self):
+        psus = list(PowerSupply.objects.all())
+        for cpu in (Cpu(tdp=65), Cpu(tdp=100)):
+            with self.subTest(required=required_psu_wattage(cpu)):
+                expected = filter_compatible_psu(psus, cpu=cpu)
+                self.assertEqual(expected, [psu for psu in psus if is_powersupply_sufficient(psu, cpu=cpu)])
+                self.assertSameIds(expected, filter_compatible_psu_qs(PowerSupply.objects.all(), cpu=cpu))
+        self.assertSameIds(
+            filter_compatible_psu(psus, cpu=Cpu(tdp=100)), PowerSupply.objects.filter(id__in=[1, 7, 8]),
+        )
+
+
+class BuildContextTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        CpuCooler.objects.create(id=1, name="Noctua NH-D15")
+        VideoCard.objects.create(id=1, name="GeForce RTX 4070", memory="12 GB")
+        for category in ("cpu", "case"):
+            refresh_specs(category)
+
+    def session(self):
+        return {
+            "build_cpu": 1, "build_motherboard": 1, "build_case": "1",
+            "build_cpu_cooler": 1, "build_video_card": 1, "build_powersupply": 404,
+        }
+
+    def assertSameComponents(self, components):
+        self.assertEqual(components["powersupply"], None)
+        self.assertEqual(components["memory"], None)
+        for category, obj in (
+            ("cpu", self.cpu), ("motherboard", self.motherboard), ("case", self.case),
+            ("cpu_cooler", CpuCooler.objects.get(id=1)), ("video_card", VideoCard.objects.get(id=1)),
+        ):
+            loaded = components[category]
+            self.assertEqual(type(loaded), type(obj))
+            fields = [field.attname for field in type(obj)._meta.concrete_fields]
+            self.assertEqual(
+                [getattr(loaded, name) for name in fields],
+                [getattr(type(obj).objects.get(id=obj.id), name) for name in fields],
+            )
+        # Spec rows ride along; a missing spec row is cached as missing.
+        self.assertEqual(_spec(components["cpu"]).power_draw, self.cpu.spec.power_draw)
+        self.assertEqual(_spec(components["case"]).form_factor_rank, 3)
+        with self.assertNumQueries(0):
+            self.assertIsNone(_spec(components["motherboard"]))
+            self.assertIsNone(_spec(components["video_card"]))
+
+    def test_one_primary_key_lookup_per_slot(self):
+        build = BuildContext(self.session())
+        with self.assertNumQueries(6):
+            components = build.components
+        self.assertSameComponents(components)
+
+    def test_aload_matches_components(self):
+        build = BuildContext(self.session())
+        with self.assertNumQueries(6):
+            components = async_to_sync(build.aload)()
+        self.assertSameComponents(components)
+
+    def test_empty_build(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(set(BuildContext({}).components.values()), {None})
+
+
+# method, url kwargs, request data, max queries, max milliseconds.
+# Counts are for cold per-process caches (catalog snapshots, search index and
+# results, rendered fragments, report LRU) with a full build in the session, so they are the worst case.
+Budget = namedtuple("Budget", ["method", "kwargs", "data", "queries", "ms"])
+
+# Wall-clock budgets depend on the machine, so they are only checked when
+# PC_BUILDER_TIME_BUDGETS is set, e.g. to 1 or to 3 on a slow CI runner.
+TIME_BUDGET_MULTIPLIER = float(os.environ.get("PC_BUILDER_TIME_BUDGETS") or 0)
+
+VIEW_BUDGETS = {
+    "main:index": Budget("get", {}, None, 2, 250),
+    "main:toggle_compatibility": Budget("get", {}, None, 4, 250),
+    "main:list_components": Budget("get", {"category": "powersupply"}, None, 14, 500),
+    "main:add_to_build": Budget("get", {"category": "cpu", "item_id": 1}, None, 7, 500),
+    "main:show_build": Budget("get", {}, None, 11, 500),
+    "main:build_compatibility": Budget("get", {}, None, 12, 500),
+    "main:component_detail": Budget("get", {"category": "cpu", "item_id": 1}, None, 4, 500),
+    "main:remove_from_build": Budget("get", {"category": "cpu"}, None, 4, 250),
+    "main:export_build": Budget("get", {}, None, 11, 250),
+    "main:import_build": Budget("post", {}, "import", 8, 500),
+    "main:ajax_search": Budget("get", {"category": "memory"}, {"q": "kingston"}, 5, 500),
+    "main:save_build_to_db": Budget("get", {}, None, 12, 500),
+    "main:my_builds": Budget("get", {}, None, 4, 500),
+    "main:delete_build": Budget("get", {"build_id": "saved"}, None, 5, 250),
+    "main:metrics": Budget("get", {}, None, 0, 250),
+    "accounts:register": Budget("get", {}, None, 0, 250),
+    "accounts:login": Budget("get", {}, None, 0, 250),
+    "accounts:logout": Budget("get", {}, None, 0, 250),
+}
+
+
+def _route_names(urlconf):
+    return {f"{urlconf.app_name}:{pattern.name}" for pattern in urlconf.urlpatterns}
+
+
+class ViewBudgetTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        CpuCooler.objects.create(id=1, name="Noctua NH-D15")
+        InternalHardDrive.objects.create(id=1, name="Samsung 990 Pro", capacity="1000 GB", type="SSD")
+        Os.objects.create(id=1, name="Microsoft Windows 11 Home")
+        VideoCard.objects.create(id=1, name="GeForce RTX 4070", memory="12 GB")
+        for i in range(3):
+            SavedBuild.objects.create(
+                user=cls.user, build_name=f"Сборка {i}", cpu=cls.cpu, motherboard=cls.motherboard,
+            )
+
+    def reset_state(self):
+        self.client.force_login(self.user)
+        session = self.client.session
+        session["compatibility_on"] = True
+        for session_key in BUILD_MAP:
+            session[session_key] = 1
+        session.save()
+
+        catalog.invalidate()
+        get_backend().reset()
+        caches["search"].clear()
+        evict_fragments()
+        report_cache().clear()
+
+    def request(self, name, budget):
+        kwargs = dict(budget.kwargs)
+        if kwargs.get("build_id") == "saved":
+            kwargs["build_id"] = SavedBuild.objects.filter(user=self.user).values_list("id", flat=True).first()
+        url = reverse(name, kwargs=kwargs)
+
+        data = budget.data
+        if data == "import":
+            data = {"build_file": SimpleUploadedFile("my.pcbuild", b'{"cpu": {"id": 1}, "memory": {"id": 1}}')}
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(self.client, budget.method)(url, data)
+            elapsed = (time.perf_counter() - started) * 1000
+        return response, queries.captured_queries, elapsed
+
+    def test_every_route_has_a_budget(self):
+        routes = _route_names(main_urls) | _route_names(accounts_urls)
+        self.assertEqual(routes - VIEW_BUDGETS.keys(), set(), "routes without a budget")
+        self.assertEqual(VIEW_BUDGETS.keys() - routes, set(), "budgets for unknown routes")
+
+    def test_view_budgets(self):
+        for name, budget in VIEW_BUDGETS.items():
+            with self.subTest(view=name):
+                self.reset_state()
+                response, queries, elapsed = self.request(name, budget)
+                self.assertLess(response.status_code, 400)
+                if len(queries) > budget.queries:
+                    listing = "\n".join(f"  {i}. {q['sql']}" for i, q in enumerate(queries, 1))
+                    self.fail(f"{name}: {len(queries)} queries, budget {budget.queries}\n{listing}")
+                if TIME_BUDGET_MULTIPLIER:
+                    limit = budget.ms * TIME_BUDGET_MULTIPLIER
+                    self.assertLessEqual(elapsed, limit, f"{name}: {elapsed:.1f} ms, budget {limit:g} ms")
+
+
+class ColumnarCatalogTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Motherboard.objects.create(id=2, name="MSI MAG B760M", socket="LGA1700", form_factor="Micro ATX")
+        Motherboard.objects.create(id=3, name="Unknown board", socket=None, form_factor=None)
+        Case.objects.create(id=2, name="Lian Li Q58", type="Mini ITX Desktop")
+        PowerSupply.objects.create(id=2, name="SFX 450", wattage=450)
+        PowerSupply.objects.create(id=3, name="No label", wattage=None)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = ColumnarCatalog(write_columnar_catalog(f"{directory.name}/catalog.col", 1))
+
+    def assertSameIds(self, columnar_ids, queryset):
+        self.assertEqual(sorted(columnar_ids), sorted(queryset.values_list("id", flat=True)))
+
+    def test_lookups_match_queryset_filters(self):
+        for cpu in (self.cpu, Cpu(socket="LGA1700"), Cpu(socket=None), Cpu(socket="sTRX4")):
+            self.assertSameIds(
+                self.store.motherboard_ids_for_socket(cpu.socket),
+                filter_compatible_motherboards_qs(cpu, Motherboard.objects.all()),
+            )
+        for motherboard in Motherboard.objects.all():
+            self.assertSameIds(
+                self.store.case_ids_for_motherboard_rank(motherboard_form_factor_rank(motherboard)),
+                filter_compatible_cases_by_motherboard_qs(motherboard, Case.objects.all()),
+            )
+        for required in (0, 450, 450.5, 2000):
+            self.assertSameIds(
+                self.store.psu_ids_at_least(required), PowerSupply.objects.filter(wattage__gte=required),
+            )
+
+    def test_prune_keeps_newer_versions(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        directory = Path(tmp.name)
+        for version in (1, 2, 3):
+            (directory / f"catalog-{version}.col").touch()
+        prune_columnar_catalogs(directory, 2)
+        self.assertEqual(sorted(p.name for p in directory.iterdir()), ["catalog-2.col", "catalog-3.col"])
+
+    @mock.patch("main.columnar._opened", None)
+    def test_counts_fall_back_to_sql_until_built(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        catalog.invalidate()
+        components = {"cpu": self.cpu, "motherboard": self.motherboard}
+        with override_settings(COLUMNAR_CATALOG_DIR=directory.name):
+            self.assertIsNone(shared_catalog())
+            with self.assertNumQueries(2):
+                from_sql = [candidate_count(category, components) for category in ("motherboard", "case")]
+
+            ensure_columnar_catalog(catalog.version())
+            self.assertIsNotNone(shared_catalog())
+            with self.assertNumQueries(0):
+                from_file = [candidate_count(category, components) for category in ("motherboard", "case")]
+        self.assertEqual(from_sql, [1, 1])
+        self.assertEqual(from_file, from_sql)
+
+    def test_candidate_ids_match_the_snapshot_indexes(self):
+        catalog.invalidate()
+        builds = [{"cpu": cpu} for cpu in (self.cpu, Cpu(socket="LGA1700"), Cpu(socket=None, tdp=400))]
+        builds += [{"motherboard": motherboard} for motherboard in Motherboard.objects.all()]
+        for build in builds + [{}]:
+            for category in ("motherboard", "case", "powersupply", "memory"):
+                expected = catalog.candidate_ids(category, build)
+                ids = self.store.candidate_ids(category, build)
+                if expected is None:
+                    self.assertIsNone(ids)
+                else:
+                    self.assertEqual(list(ids), list(expected))
+
+    @mock.patch("main.columnar._opened", None)
+    def test_list_pages_come_from_the_shared_file(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        catalog.invalidate()
+        session = self.client.session
+        session["build_motherboard"] = 2  # Micro ATX
+        session.save()
+        with override_settings(COLUMNAR_CATALOG_DIR=directory.name):
+            ensure_columnar_catalog(catalog.version())
+            response = self.client.get(reverse("main:list_components", args=["case"]))
+        self.assertEqual([item.id for item in response.context["items"]], [1])
+        # The worker never loaded its own case snapshot and index.
+        self.assertNotIn("case", catalog._snapshots)
+
+    def test_rows_by_id(self):
+        self.assertEqual(
+            self.store.table("motherboard").row(2),
+            {"id": 2, "name": "MSI MAG B760M", "socket": "LGA1700", "form_factor_rank": 2},
+        )
+        self.assertEqual(self.store.table("memory").row(1)["capacity_gb"], 16)
+        self.assertIsNone(self.store.table("cpu").row(404))
+
+
+class CatalogIndexTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Motherboard.objects.create(id=2, name="MSI MAG B760M", socket="LGA1700", form_factor="Micro ATX")
+        Motherboard.objects.create(id=3, name="Unknown board", socket=None, form_factor=None)
+        Case.objects.create(id=2, name="Lian Li Q58", type="Mini ITX Desktop")
+        Case.objects.create(id=3, name="Open frame", type=None)
+
+    def setUp(self):
+        catalog.invalidate()
+
+    def assertSameIds(self, index_ids, queryset):
+        self.assertEqual(sorted(index_ids), sorted(queryset.values_list("id", flat=True)))
+
+    def test_lookups_match_queryset_filters(self):
+        for cpu in (self.cpu, Cpu(socket="LGA1700"), Cpu(socket=None), Cpu(socket="sTRX4")):
+            self.assertSameIds(
+                filter_compatible_motherboard_ids(catalog.socket_index(), cpu),
+                filter_compatible_motherboards_qs(cpu, Motherboard.objects.all()),
+            )
+        for motherboard in Motherboard.objects.all():
+            self.assertSameIds(
+                filter_compatible_case_ids(catalog.form_factor_index(), motherboard),
+                filter_compatible_cases_by_motherboard_qs(motherboard, Case.objects.all()),
+            )
+
+    def test_indexes_are_built_with_the_snapshot(self):
+        self.assertIn("socket_index", catalog.snapshot("motherboard")._derived)
+        self.assertIn("form_factor_index", catalog.snapshot("case")._derived)
+        with self.assertNumQueries(0):
+            catalog.socket_index()
+            catalog.form_factor_index()
+
+    def test_candidate_ids_are_sorted_compatible_ids(self):
+        for motherboard in Motherboard.objects.all():
+            ids = catalog.candidate_ids("case", {"motherboard": motherboard})
+            self.assertEqual(list(ids), sorted(ids))
+            self.assertSameIds(ids, filter_compatible_cases_by_motherboard_qs(motherboard, Case.objects.all()))
+        self.assertIsNone(catalog.candidate_ids("memory", {"cpu": self.cpu}))
+        self.assertIsNone(catalog.candidate_ids("case", {}))
+
+    def test_psu_candidates_come_from_the_wattage_index(self):
+        PowerSupply.objects.create(id=2, name="SFX 450", wattage=450)
+        PowerSupply.objects.create(id=3, name="No label", wattage=None)
+        PowerSupply.objects.create(id=4, name="Seasonic 1000", wattage=1000)
+        catalog.invalidate()
+        self.assertIn("wattage_index", catalog.snapshot("powersupply")._derived)
+        for cpu in (None, self.cpu, Cpu(tdp=400)):
+            build = {"cpu": cpu}
+            ids = catalog.candidate_ids("powersupply", build)
+            self.assertEqual(list(ids), sorted(ids))
+            self.assertSameIds(
+                ids, filter_compatible_candidates_qs("powersupply", PowerSupply.objects.all(), build),
+            )
+
+    def test_list_pages_come_from_the_index(self):
+        for i in range(4, 9):
+            Case.objects.create(id=i, name=f"Case {i}", type="ATX Mid Tower" if i % 2 else "Mini ITX Tower")
+        catalog.invalidate()
+        session = self.client.session
+        session["build_motherboard"] = 2  # Micro ATX
+        session.save()
+        url = reverse("main:list_components", args=["case"])
+
+        seen, cursor = [], None
+        while True:
+            params = {"size": 2, **({"after": cursor} if cursor else {})}
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, params)
+            page_query = queries.captured_queries[-1]["sql"]
+            self.assertIn('"case"."id" IN', page_query)
+            seen += [item.id for item in response.context["items"]]
+            cursor = response.context["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, [1, 5, 7])
+
+    def test_update_regroups_only_changed_buckets(self):
+        cases = list(Case.objects.order_by("id"))
+        index = RankIndex.build(cases, case_form_factor_rank)
+        cases[1].type = "ATX Mid Tower"
+        cases.append(Case(id=4, name="Tiny", type="Mini ITX Tower"))
+
+        updated = index.updated(cases, case_form_factor_rank)
+        self.assertEqual(updated.buckets, RankIndex.build(cases, case_form_factor_rank).buckets)
+        self.assertIs(updated.buckets[None], index.buckets[None])
+        self.assertEqual(list(updated.ids_at_least(1)), [4, 1, 2])
+        self.assertEqual(updated.count_at_least(3), 2)
+        self.assertEqual(len(updated.ids_at_least(5)), 0)
+
+
+class SearchBackendChecks:
+    """Shared by both backends; they must agree on what matches and in which order."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i, name in enumerate((
+            "AMD Ryzen 7 5700X", "Intel Core i5-12400F", "AMD Ryzen 5 7600", "AMD Athlon 3000G",
+        ), 2):
+            Cpu.objects.create(id=i, name=name, socket="AM4")
+
+    def setUp(self):
+        self.backend = self.backend_class()
+
+    def names(self, query, queryset=None, limit=10):
+        if queryset is None:
+            queryset = Cpu.objects.all()
+        return [row.name for row in self.backend.search(queryset, query, limit)]
+
+    def test_word_start_matches_rank_first(self):
+        self.assertEqual(self.names("ryzen")[:3], ["AMD Ryzen 5 5600X", "AMD Ryzen 7 5700X", "AMD Ryzen 5 7600"])
+
+    def test_substring_inside_a_word_still_matches(self):
+        self.assertEqual(self.names("700")[0], "AMD Ryzen 7 5700X")
+        self.assertEqual(self.names("12400"), ["Intel Core i5-12400F"])
+        self.assertCountEqual(self.names("600")[:2], ["AMD Ryzen 5 5600X", "AMD Ryzen 5 7600"])
+
+    def test_fuzzy_match_ranks_after_substring_matches(self):
+        self.assertEqual(self.names("athlom"), ["AMD Athlon 3000G"])
+        self.assertEqual(self.names("Ryzen", limit=1), ["AMD Ryzen 5 5600X"])
+
+    def test_filtered_queryset(self):
+        Cpu.objects.filter(id=2).update(socket="AM5")
+        self.assertNotIn("AMD Ryzen 7 5700X", self.names("700", Cpu.objects.filter(socket="AM4")))
+
+
+class NgramSearchBackendTests(SearchBackendChecks, CatalogTestCase):
+    backend_class = NgramSearchBackend
+
+    def test_rejected_candidates_cost_one_query(self):
+        Cpu.objects.bulk_create(
+            Cpu(id=i, name=f"AMD Ryzen {i}", socket="AM5") for i in range(100, 100 + MAX_CANDIDATES + 50)
+        )
+        self.backend.index_for(Cpu)
+        with self.assertNumQueries(1):
+            names = self.names("ryzen", Cpu.objects.filter(socket="AM4"))
+        self.assertEqual(names, ["AMD Ryzen 5 5600X", "AMD Ryzen 7 5700X", "AMD Ryzen 5 7600"])
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "pg_trgm needs PostgreSQL")
+class TrigramSearchBackendTests(SearchBackendChecks, CatalogTestCase):
+    backend_class = TrigramSearchBackend
+
+    def test_filters_use_the_trigram_index(self):
+        # The catalog tables are created after the migrations ran here.
+        migration = importlib.import_module("main.migrations.0006_name_trigram_indexes")
+        with connection.schema_editor() as schema_editor:
+            migration.create_trigram_indexes(None, schema_editor)
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        for query in ("ryzen", "700", "athlom"):
+            with self.subTest(query=query):
+                plan = self.backend.matches(Cpu.objects.all(), query).explain()
+                self.assertIn("cpu_name_trgm", plan)
+                self.assertNotIn("Seq Scan", plan)
+
+
+class ConditionalResponseTests(CatalogTestCase):
+    def setUp(self):
+        bump_catalog_version()
+        catalog.invalidate()
+        self.url = reverse("main:component_detail", args=["cpu", 1])
+
+    def test_anonymous_pages_are_shared_and_revalidated(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+        self.assertEqual(response["Vary"], "Cookie")
+
+        revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated["ETag"], response["ETag"])
+
+    def test_signed_in_pages_are_private(self):
+        anonymous = self.client.get(self.url)
+        self.client.force_login(self.user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=anonymous["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        self.assertEqual(response["Vary"], "Cookie")
+
+    def test_pages_depending_on_the_build_are_private(self):
+        session = self.client.session
+        session["build_cpu"] = 1
+        session.save()
+        response = self.client.get(reverse("main:list_components", args=["motherboard"]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+
+    def test_if_modified_since_alone_is_not_answered_with_304(self):
+        # Neither a deploy nor signing in changes the catalog's date.
+        with override_settings(CATALOG_ETAG_SALT="release-1"):
+            response = self.client.get(self.url)
+        self.assertNotIn("Last-Modified", response)
+        since = http_date(time.time() + 60)
+        with override_settings(CATALOG_ETAG_SALT="release-2"):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+
+    def test_etag_changes_with_catalog_version(self):
+        etag = self.client.get(self.url)["ETag"]
+        bump_catalog_version()
+        catalog.invalidate()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_changes_on_deploy(self):
+        with override_settings(CATALOG_ETAG_SALT="release-1"):
+            etag = self.client.get(self.url)["ETag"]
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with override_settings(CATALOG_ETAG_SALT="release-2"):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ProfilingMiddlewareTests(CatalogTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.profile_dir = Path(directory.name)
+        profile_settings = override_settings(PROFILE_DIR=self.profile_dir)
+        profile_settings.enable()
+        self.addCleanup(profile_settings.disable)
+        self.staff = User.objects.create_user(username="staff", password="secret", is_staff=True)
+        # show_build stays synchronous whatever ASYNC_VIEWS says.
+        self.url = reverse("main:show_build")
+
+    def metadata(self, response):
+        name = response["X-Profile-Id"]
+        return json.loads((self.profile_dir / f"{name}.json").read_text(encoding="utf-8"))
+
+    def test_staff_request_is_profiled(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url, {"_profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        metadata = self.metadata(response)
+        self.assertEqual(metadata["mode"], "sampling")
+        self.assertEqual(metadata["view"], "main:show_build")
+        self.assertTrue((self.profile_dir / metadata["profile"]).exists())
+
+    def test_cprofile_from_header(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url, HTTP_X_PROFILE=" cProfile ")
+        metadata = self.metadata(response)
+        self.assertEqual(metadata["mode"], "cprofile")
+        self.assertTrue(metadata["profile"].endswith(".prof"))
+
+    def test_disabled_or_unknown_modes_are_ignored(self):
+        self.client.force_login(self.staff)
+        for value in ("0", "off", "yes", ""):
+            with self.subTest(value=value):
+                response = self.client.get(self.url, {"_profile": value})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn("X-Profile-Id", response)
+        self.assertEqual(list(self.profile_dir.iterdir()), [])
+
+    def test_only_staff_can_profile(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url, {"_profile": "1"})
+        self.assertNotIn("X-Profile-Id", response)
+
+    async def test_async_handler_profiles_sync_views(self):
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(self.url, {"_profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.metadata(response)["view"], "main:show_build")
+
+    async def test_async_views_are_profiled(self):
+        use_async_views(self)
+        url = reverse("main:component_detail", args=["cpu", 1])
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(url, {"_profile": "cprofile"})
+        self.assertEqual(response.status_code, 200)
+        metadata = self.metadata(response)
+        self.assertEqual(metadata["mode"], "cprofile")
+        self.assertEqual(metadata["category"], "cpu")
+        response = await self.async_client.get(url, {"_profile": "0"})
+        self.assertNotIn("X-Profile-Id", response)
+
+
+class AsyncViewTests(CatalogTestCase):
+    def setUp(self):
+        for client in (self.client, self.async_client):
+            client.force_login(self.user)
+            session = client.session
+            session["build_cpu"] = self.cpu.id
+            session["build_memory"] = self.memory.id
+            session.save()
+
+    def assert_same_response(self, url, data=None):
+        use_async_views(self, False)
+        self.assertFalse(iscoroutinefunction(resolve(url).func))
+        expected = self.client.get(url, data)
+
+        use_async_views(self)
+        self.assertTrue(iscoroutinefunction(resolve(url).func))
+        actual = async_to_sync(self.async_client.get)(url, data)
+
+        self.assertEqual(actual.status_code, expected.status_code)
+        self.assertEqual(actual["Content-Type"], expected["Content-Type"])
+        self.assertEqual(actual.content, expected.content)
+        return actual
+
+    def test_list_components(self):
+        response = self.assert_same_response(reverse("main:list_components", args=["motherboard"]))
+        self.assertContains(response, "ASUS PRIME B550-PLUS")
+        self.assert_same_response(reverse("main:list_components", args=["powersupply"]), {"sort": "name"})
+        self.assert_same_response(reverse("main:list_components", args=["cpu"]), {"after": "bogus"})
+
+    def test_component_detail(self):
+        self.assert_same_response(reverse("main:component_detail", args=["cpu", 1]))
+        self.assert_same_response(reverse("main:component_detail", args=["cpu", 999]))
+
+    def test_ajax_search(self):
+        url = reverse("main:ajax_search", args=["motherboard"])
+        self.assert_same_response(url)
+        self.assert_same_response(url, {"format": "compact"})
+        response = self.assert_same_response(url, {"q": "prime"})
+        self.assertEqual([item["id"] for item in response.json()["items"]], [1])
+
+    def test_asgi_middleware_chain_stays_async(self):
+        # load_middleware logs every sync/async adaptation when DEBUG is on.
+        with override_settings(DEBUG=True), self.assertNoLogs("django.request", "DEBUG"):
+            handler = ASGIHandler()
+        self.assertTrue(iscoroutinefunction(handler._middleware_chain))
+        # Only Django's own CsrfViewMiddleware.process_view is sync and gets
+        # wrapped; the project's middleware must stay on the event loop.
+        for method in handler._view_middleware:
+            if isinstance(method, SyncToAsync):
+                self.assertIs(type(method.func.__self__), CsrfViewMiddleware)
+
+
+class TestRunnerTests(SimpleTestCase):
+    def test_runtime_files_stay_out_of_the_checkout(self):
+        for name in ("QUERY_LOG_DIR", "PROFILE_DIR", "COLUMNAR_CATALOG_DIR"):
+            with self.subTest(name):
+                self.assertFalse(Path(getattr(settings, name)).is_relative_to(settings.BASE_DIR))
+
+
+class QueryLogTests(CatalogTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log_dir = Path(directory.name)
+        log_settings = override_settings(
+            QUERY_LOG_DIR=self.log_dir, SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_EXPLAIN_RATE=1,
+        )
+        log_settings.enable()
+        self.addCleanup(log_settings.disable)
+        # The queued EXPLAINs are run by the test, not a background thread.
+        patcher = mock.patch.object(QueryLog, "_start_explainer")
+        self.start_explainer = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_slow_queries_are_not_explained_in_the_request(self):
+        log = QueryLog()
+        sql = 'SELECT "cpu"."id" FROM "cpu" WHERE "cpu"."socket" = %s'
+        with CaptureQueriesContext(connection) as queries:
+            log.record(sql, ("AM4",), False, 0.5, connection)
+        self.assertEqual(len(queries), 0)
+        self.start_explainer.assert_called_once_with()
+        log.explain_pending()
+
+        log.flush()
+        raw = "".join(path.read_text(encoding="utf-8") for path in self.log_dir.glob("queries-*.json"))
+        self.assertNotIn("AM4", raw)
+        [entry] = load_query_logs(self.log_dir).values()
+        self.assertNotIn("params", entry)
+        self.assertTrue(entry["plan"])
+        out = io.StringIO()
+        call_command("slow_queries", "--explain", stdout=out)
+        self.assertIn("      | ", out.getvalue())
+
+    def test_explain_sample_rate(self):
+        log = QueryLog()
+        with override_settings(SLOW_QUERY_EXPLAIN_RATE=0):
+            log.record('SELECT "cpu"."id" FROM "cpu"', (), False, 0.5, connection)
+        self.start_explainer.assert_not_called()
+        log.explain_pending()
+        [entry] = log.snapshot().values()
+        self.assertIsNone(entry["plan"])
+
+    def test_concurrent_flushes(self):
+        log = QueryLog()
+        for i in range(50):
+            log.record(f"SELECT {i} FROM cpu WHERE name = 'q{i}'", (), False, 0.001 * i, connection)
+        threads = [threading.Thread(target=log.flush) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([path.suffix for path in self.log_dir.iterdir()], [".json"])
+        [entry] = load_query_logs(self.log_dir).values()
+        self.assertEqual(entry["count"], 50)
+
+
+class ComponentRecordTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Case.objects.create(id=2, name="Fractal Node 304", type="Mini ITX Tower")
+        for category in ("cpu", "motherboard", "memory", "case"):
+            refresh_specs(category)
+
+    def record(self, category, item_id):
+        return component_records(CATEGORY_MODELS[category].objects.filter(id=item_id), category).get()
+
+    def test_records_use_spec_columns(self):
+        CpuSpec.objects.filter(cpu_id=1).update(power_draw=999)
+        MotherboardSpec.objects.filter(motherboard_id=1).update(form_factor_rank=4)
+        self.assertEqual(estimate_cpu_power(self.record("cpu", 1)), 999)
+        self.assertEqual(motherboard_form_factor_rank(self.record("motherboard", 1)), 4)
+        self.assertFalse(is_case_compatible_with_motherboard(self.record("motherboard", 1), self.record("case", 1)))
+
+    def test_records_without_spec_rows_parse_the_text(self):
+        CpuSpec.objects.all().delete()
+        record = self.record("cpu", 1)
+        self.assertIsNone(record.spec__power_draw)
+        self.assertEqual(estimate_cpu_power(record), 65)
+
+    def test_records_agree_with_models(self):
+        for category in ("cpu", "motherboard", "memory", "case"):
+            model_class = CATEGORY_MODELS[category]
+            models = {obj.id: obj for obj in model_class.objects.select_related("spec")}
+            for record in component_records(model_class.objects.all(), category):
+                with self.subTest(category=category, id=record.id):
+                    self.assertIsNotNone(_spec(record))
+                    obj = models[record.id]
+                    if category == "cpu":
+                        self.assertEqual(estimate_cpu_power(record), estimate_cpu_power(obj))
+                    elif category == "memory":
+                        self.assertEqual(estimate_memory_power(record), estimate_memory_power(obj))
+                        self.assertEqual(parse_memory_capacity(record), parse_memory_capacity(obj))
+                    elif category == "motherboard":
+                        self.assertEqual(motherboard_form_factor_rank(record), motherboard_form_factor_rank(obj))
+                    else:
+                        self.assertEqual(case_form_factor_rank(record), case_form_factor_rank(obj))
+
+
+class ClearCatalogTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        refresh_specs("cpu")
+        refresh_specs("case")
+        cls.saved = SavedBuild.objects.create(user=cls.user, build_name="Сборка", cpu=cls.cpu)
+
+    def test_refuses_to_detach_saved_builds_unless_asked(self):
+        with self.assertRaises(ValueError):
+            clear_catalog(["cpu"])
+        self.assertTrue(Cpu.objects.exists())
+        with self.assertRaises(CommandError):
+            call_command("generate_catalog", "--rows", "1", "--categories", "cpu", "--truncate", stdout=io.StringIO())
+
+        clear_catalog(["cpu"], detach_saved_builds=True)
+        self.saved.refresh_from_db()
+        self.assertIsNone(self.saved.cpu_id)
+        self.assertFalse(Cpu.objects.exists())
+        self.assertFalse(CpuSpec.objects.exists())
+
+    @mock.patch("main.columnar._opened", None)
+    def test_truncate_without_specs_drops_stale_spec_rows(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with override_settings(COLUMNAR_CATALOG_DIR=directory.name):
+            call_command(
+                "generate_catalog", "--rows", "2", "--categories", "case", "--truncate", "--no-specs",
+                stdout=io.StringIO(),
+            )
+            catalog.invalidate()
+            # The new version's columnar file is written along with the bump.
+            self.assertEqual(len(shared_catalog().table("case")), 2)
+        self.assertEqual(Case.objects.count(), 2)
+        self.assertFalse(CaseSpec.objects.exists())
+        self.assertTrue(CpuSpec.objects.exists())
+
+
+class FragmentCacheTests(CatalogTestCase):
+    def setUp(self):
+        evict_fragments()
+        self.url = reverse("main:list_components", args=["cpu"])
+
+    def test_fragment_is_cached_until_its_category_is_evicted(self):
+        self.assertContains(self.client.get(self.url), "AMD Ryzen 5 5600X")
+        # Changed without a catalog version bump: the cached item list is served.
+        Cpu.objects.filter(id=1).update(name="AMD Ryzen 7 5800X")
+        self.assertContains(self.client.get(self.url), "AMD Ryzen 5 5600X")
+
+        evict_fragments("motherboard")
+        self.assertContains(self.client.get(self.url), "AMD Ryzen 5 5600X")
+        evict_fragments("cpu")
+        self.assertContains(self.client.get(self.url), "AMD Ryzen 7 5800X")
+
+    def test_culling_fragments_keeps_generations(self):
+        parts = (True, (), False, "id", None, 20)
+        before = fragment_cache_key("cpu", parts)
+        evict_fragments("cpu")
+        after = fragment_cache_key("cpu", parts)
+        self.assertNotEqual(after, before)
+        caches["fragments"].clear()
+        self.assertEqual(fragment_cache_key("cpu", parts), after)
+
+
+class ReportCacheTests(CatalogTestCase):
+    def setUp(self):
+        report_cache().clear()
+        catalog.invalidate()
+
+    def build(self, **session):
+        build = BuildContext(session)
+        build.components  # loaded up front so only the report is measured
+        return build
+
+    def test_repeated_report_is_a_hit(self):
+        build = self.build(build_cpu=1, build_motherboard=1)
+        report = compatibility_report(build)
+        hits = report_cache().stats["hits"]
+        with self.assertNumQueries(0):
+            self.assertIs(compatibility_report(build), report)
+        self.assertEqual(report_cache().stats["hits"], hits + 1)
+        self.assertTrue(report["compatible"])
+
+    @override_settings(COMPATIBILITY_REPORT_CACHE_SIZE=2)
+    def test_least_recently_used_report_is_evicted(self):
+        self.assertEqual(report_cache().maxsize, 2)
+        builds = [self.build(build_cpu=1), self.build(build_memory=1), self.build(build_case=1)]
+        first = compatibility_report(builds[0])
+        compatibility_report(builds[1])
+        compatibility_report(builds[2])
+        self.assertEqual(len(report_cache()), 2)
+        self.assertIsNot(compatibility_report(builds[0]), first)
+
+    def test_catalog_version_bump_retires_reports(self):
+        build = self.build(build_cpu=1)
+        report = compatibility_report(build)
+        bump_catalog_version()
+        catalog.invalidate()
+        self.assertIsNot(compatibility_report(build), report)
+
+
+@override_settings(CATALOG_VERSION_CHECK_INTERVAL=0)
+class CatalogCacheTests(CatalogTestCase):
+    def setUp(self):
+        self.cache = CatalogCache()
+
+    def test_hits_and_misses(self):
+        with self.assertNumQueries(2):  # version, rows
+            snapshot = self.cache.snapshot("cpu")
+        self.assertIs(self.cache.snapshot("cpu"), snapshot)
+        self.assertEqual(self.cache.get("cpu", "1"), self.cpu)
+        self.assertIsNone(self.cache.get("cpu", "x"))
+        self.assertEqual((self.cache.stats["misses"], self.cache.stats["hits"]), (1, 2))
+
+    def test_version_bump_reloads(self):
+        snapshot = self.cache.snapshot("cpu")
+        Cpu.objects.create(id=2, name="Intel Core i5-14600K", socket="LGA1700")
+        self.assertIs(self.cache.snapshot("cpu"), snapshot)
+        bump_catalog_version()
+        reloaded = self.cache.snapshot("cpu")
+        self.assertIsNot(reloaded, snapshot)
+        self.assertEqual(len(reloaded), 2)
+        self.assertEqual(self.cache.stats["reloads"], 1)
+
+    def test_invalidate_drops_snapshots(self):
+        snapshot = self.cache.snapshot("cpu")
+        self.cache.invalidate()
+        self.assertIsNot(self.cache.snapshot("cpu"), snapshot)
+        self.assertEqual(self.cache.stats["misses"], 2)
+
+    def test_single_lookups_do_not_load_the_category(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.cache.get("cpu", 1), self.cpu)
+        self.assertIsNone(self.cache.get("cpu", 404))
+        self.assertNotIn("cpu", self.cache._snapshots)
+        self.assertEqual(self.cache.stats["lookups"], 2)
+
+        self.cache.snapshot("cpu")
+        self.assertEqual(self.cache.get("cpu", 1), self.cpu)
+        self.assertEqual((self.cache.stats["lookups"], self.cache.stats["hits"]), (2, 1))
+
+    @override_settings(CATALOG_VERSION_CHECK_INTERVAL=60)
+    @mock.patch("main.catalog._catalog_queryset", return_value=[])
+    def test_categories_load_independently(self, catalog_queryset):
+        self.cache.version()
+        loaded = threading.Event()
+
+        def load_case():
+            self.cache.snapshot("case")
+            loaded.set()
+
+        # A cold load of cpu is in progress; case must not wait for it.
+        with self.cache._locks["cpu"]:
+            thread = threading.Thread(target=load_case)
+            thread.start()
+            self.assertTrue(loaded.wait(5))
+        thread.join()
+
+    def test_concurrent_lookups_are_all_counted(self):
+        self.cache.snapshot("cpu")
+        self.cache.stats.clear()
+        with override_settings(CATALOG_VERSION_CHECK_INTERVAL=60):
+            def lookups():
+                for _ in range(2000):
+                    self.cache.snapshot("cpu")
+
+            threads = [threading.Thread(target=lookups) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(self.cache.stats["hits"], 16000)
+
+
+class KeysetPaginationTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for item_id, name in ((2, "Intel Core i5"), (3, "AMD Ryzen 5 5600X"), (4, None), (5, "Intel Core i5")):
+            Cpu.objects.create(id=item_id, name=name)
+
+    def walk(self, size, sort="id", ids=None):
+        pages, after = [], None
+        while True:
+            items, cursor = keyset_page(Cpu.objects.all(), size, after=after, sort=sort, ids=ids)
+            pages.append([item.id for item in items])
+            if cursor is None:
+                return pages
+            after = decode_cursor(cursor)
+
+    def test_cursor_round_trip(self):
+        for values in ([7], ["Ryzen «X»", 3], ["", 0]):
+            self.assertEqual(decode_cursor(encode_cursor(values)), values)
+
+    def test_pages_by_id(self):
+        self.assertEqual(self.walk(2), [[1, 2], [3, 4], [5]])
+        self.assertEqual(self.walk(5), [[1, 2, 3, 4, 5]])
+        self.assertEqual(self.walk(2, ids=[1, 3, 5]), [[1, 3], [5]])
+
+    def test_sort_by_name_breaks_ties_on_id(self):
+        # A NULL name sorts as "".
+        self.assertEqual(self.walk(1, sort="name"), [[4], [1], [3], [2], [5]])
+        self.assertEqual(self.walk(2, sort="name"), [[4, 1], [3, 2], [5]])
+
+    def test_last_page_has_no_next_cursor(self):
+        items, cursor = keyset_page(Cpu.objects.all(), 2, after=[3])
+        self.assertEqual([item.id for item in items], [4, 5])
+        self.assertIsNone(cursor)
+        items, cursor = keyset_page(Cpu.objects.all(), 2, after=[5])
+        self.assertEqual((items, cursor), ([], None))
+
+    def test_tampered_cursors_are_rejected(self):
+        for cursor in ("not base64!", encode_cursor({"id": 1})[:-2], "e30", encode_cursor([])):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+        for sort, after in (("id", ["1"]), ("id", [True]), ("name", [3]), ("name", ["x", "3"]), ("price", [1])):
+            with self.subTest(sort=sort, after=after), self.assertRaises(InvalidCursor):
+                keyset_page(Cpu.objects.all(), 2, after=after, sort=sort)
+
+        response = self.client.get(reverse("main:list_components", args=["cpu"]), {"after": "e30"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_results_are_one_capped_page(self):
+        self.client.force_login(self.user)
+        url = reverse("main:ajax_search", args=["cpu"])
+        first = self.client.get(url, {"q": "intel", "size": 1}).json()
+        self.assertEqual(len(first["items"]), 1)
+        self.assertIsNone(first["next"])
+        # A listing cursor does not page through search results.
+        after = self.client.get(url, {"q": "intel", "size": 1, "after": encode_cursor([2])}).json()
+        self.assertEqual(after, first)
+
+
+class SlotChangeDeltaTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Cpu.objects.create(id=2, name="Intel Core i7-14700K", socket="LGA1700", tdp=125)
+        Motherboard.objects.create(id=2, name="MSI PRO Z790-P", socket="LGA1700", form_factor="ATX")
+
+    def setUp(self):
+        catalog.invalidate()
+        self.client.force_login(self.user)
+        session = self.client.session
+        session["build_motherboard"] = 1
+        session.save()
+
+    def change(self, url):
+        return self.client.get(url, HTTP_ACCEPT="application/json")
+
+    def test_html_requests_redirect_without_a_delta(self):
+        response = self.client.get(reverse("main:add_to_build", args=["cpu", 2]))
+        self.assertRedirects(response, reverse("main:show_build"), fetch_redirect_response=False)
+        self.assertEqual(self.client.session["build_cpu"], 2)
+        self.assertNotIn(STATE_SESSION_KEY, self.client.session)
+
+    def test_json_requests_get_the_delta(self):
+        response = self.change(reverse("main:add_to_build", args=["cpu", 2]))
+        self.assertEqual(response.json(), {
+            "slot": "cpu",
+            "rules": [{"rule": "cpu_motherboard_socket", "before": "skipped", "after": "fail"}],
+            "candidates": [{"category": "motherboard", "before": 2, "after": 1}],
+        })
+        self.assertEqual(self.client.session["build_cpu"], 2)
+
+        response = self.change(reverse("main:remove_from_build", args=["cpu"]))
+        self.assertEqual(response.json(), {
+            "slot": "cpu",
+            "rules": [{"rule": "cpu_motherboard_socket", "before": "fail", "after": "skipped"}],
+            "candidates": [{"category": "motherboard", "before": 1, "after": 2}],
+        })
+        self.assertNotIn("build_cpu", self.client.session)
+
+    def test_state_is_kept_in_the_session(self):
+        self.change(reverse("main:add_to_build", args=["cpu", 2]))
+        state = self.client.session[STATE_SESSION_KEY]
+        self.assertEqual(state["key"][1:3], [2, 1])  # version, then cpu, motherboard
+        self.assertEqual(state["rules"]["cpu_motherboard_socket"], False)
+        self.assertEqual(state["candidates"]["motherboard"], 1)
+
+        # The next change starts from the stored counts rather than recounting...
+        session = self.client.session
+        session[STATE_SESSION_KEY] = {**state, "candidates": {**state["candidates"], "motherboard": 99}}
+        session.save()
+        delta = self.change(reverse("main:remove_from_build", args=["cpu"])).json()
+        self.assertEqual(delta["candidates"], [{"category": "motherboard", "before": 99, "after": 2}])
+
+        # ...but only when they were computed for the current build.
+        self.change(reverse("main:add_to_build", args=["cpu", 2]))
+        session = self.client.session
+        stale = session[STATE_SESSION_KEY]
+        session[STATE_SESSION_KEY] = {**stale, "key": [stale["key"][0], 1, 1], "candidates": {"motherboard": 99}}
+        session.save()
+        delta = self.change(reverse("main:remove_from_build", args=["cpu"])).json()
+        self.assertEqual(delta["candidates"], [{"category": "motherboard", "before": 1, "after": 2}])
+
+
+@override_settings(CATALOG_VERSION_CHECK_INTERVAL=0)
+class SearchCacheTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Cpu.objects.create(id=2, name="Intel Core i5-14600K", socket="LGA1700")
+        Motherboard.objects.create(id=2, name="MSI PRO Z790-P", socket="LGA1700", form_factor="ATX")
+
+    def setUp(self):
+        caches["search"].clear()
+        get_backend().reset()
+
+    def search(self, compatibility_on=True, **session):
+        build = BuildContext(session)
+        build.components
+        hits, misses = search_cache_stats["hits"], search_cache_stats["misses"]
+        with mock.patch("main.search.search", wraps=search_module.search) as backend:
+            results = cached_search("motherboard", "  PRO ", 10, compatibility_on, build)
+        self.assertEqual(search_cache_stats["hits"] - hits, 1 - backend.call_count)
+        self.assertEqual(search_cache_stats["misses"] - misses, backend.call_count)
+        return [hit.id for hit in results], backend.call_count == 0
+
+    def test_repeated_query_is_a_hit(self):
+        self.assertEqual(self.search(build_cpu=2), ([2], False))
+        self.assertEqual(self.search(build_cpu=2), ([2], True))
+
+    def test_version_bump_is_a_miss(self):
+        self.search(build_cpu=2)
+        bump_catalog_version()
+        self.assertEqual(self.search(build_cpu=2), ([2], False))
+
+    def test_only_slots_the_filter_reads_are_in_the_key(self):
+        self.search(build_cpu=2)
+        self.assertEqual(self.search(build_cpu=1), ([1], False))
+        # Memory does not narrow down motherboards.
+        self.assertEqual(self.search(build_cpu=1, build_memory=1), ([1], True))
+
+    def test_key_depends_on_compatibility_on(self):
+        build = BuildContext({"build_cpu": 2})
+        self.assertNotEqual(
+            search_cache_key("motherboard", "pro", 10, True, build),
+            search_cache_key("motherboard", "pro", 10, False, build),
+        )
+        self.search(build_cpu=2)
+        self.assertEqual(self.search(False, build_cpu=2), ([2, 1], False))
+        # With compatibility off the build does not matter at all.
+        self.assertEqual(self.search(False, build_cpu=1), ([2, 1], True))
+
+
+class PerformanceMiddlewareTests(CatalogTestCase):
+    SERVER_TIMING = re.compile(
+        r'total;dur=(\d+\.\d\d), db;dur=(\d+\.\d\d);desc="(\d+) queries", tpl;dur=(\d+\.\d\d)'
+    )
+
+    def setUp(self):
+        self.url = reverse("main:component_detail", args=["cpu", 1])
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        match = self.SERVER_TIMING.fullmatch(response["Server-Timing"])
+        self.assertIsNotNone(match, response["Server-Timing"])
+        total, db, count, template = match.groups()
+        self.assertEqual(int(count), len(queries))
+        self.assertGreater(float(total), 0)
+        self.assertLessEqual(float(db), float(total))
+        self.assertLessEqual(float(template), float(total))
+
+    def test_histograms_count_requests_per_view(self):
+        def series(histogram, view):
+            # (sum, count) of one view's series.
+            _, total, count = histogram.snapshot().get(view, (None, 0, 0))
+            return total, count
+
+        views = ("main:component_detail", "main:index")
+        before = {view: (series(request_duration, view), series(db_queries, view)) for view in views}
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+            self.client.get(self.url)
+
+        self.assertEqual(series(request_duration, "main:component_detail")[1], before["main:component_detail"][0][1] + 2)
+        # Every query of the two requests lands in that view's query-count series.
+        query_total, query_count = series(db_queries, "main:component_detail")
+        before_total, before_count = before["main:component_detail"][1]
+        self.assertEqual((query_total - before_total, query_count - before_count), (len(queries), 2))
+        self.assertEqual(
+            (series(request_duration, "main:index"), series(db_queries, "main:index")), before["main:index"],
+        )
+
+        response = self.client.get(reverse("main:metrics"))
+        self.assertRegex(
+            response.content.decode(),
+            r'pcbuilder_request_duration_seconds_count\{view="main:component_detail"\} \d+',
+        )
+
+
+@override_settings(METRICS_ALLOWED_IPS=["10.0.0.5"], METRICS_TOKEN="s3cret")
+class MetricsAccessTests(CatalogTestCase):
+    def setUp(self):
+        self.url = reverse("main:metrics")
+
+    def test_public_requests_are_refused(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+
+    def test_allowed_address(self):
+        response = self.client.get(self.url, REMOTE_ADDR="10.0.0.5")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "pcbuilder_request_duration_seconds")
+
+    def test_token(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION="Bearer s3cret").status_code, 200)
+        with override_settings(METRICS_TOKEN=""):
+            self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION="Bearer ").status_code, 403)
+
+    def test_staff(self):
+        self.client.force_login(User.objects.create_user(username="ops", is_staff=True))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+class SpecTests(CatalogTestCase):
+    # What each category's spec row stands in for.
+    CHECKS = {
+        "cpu": (estimate_cpu_power,),
+        "video_card": (estimate_gpu_power,),
+        "memory": (estimate_memory_power, parse_memory_capacity),
+        "hdd": (estimate_drive_power,),
+        "motherboard": (motherboard_form_factor_rank,),
+        "case": (case_form_factor_rank,),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for category in SPEC_MAP:
+            generate_category(category, 200, seed=7, start_id=100)
+
+    def test_refresh_specs_replaces_every_row(self):
+        for category, (model_class, spec_class, _) in SPEC_MAP.items():
+            with self.subTest(category=category):
+                rows = model_class.objects.count()
+                self.assertEqual(refresh_specs(category, batch_size=64), rows)
+                self.assertEqual(refresh_specs(category), rows)
+                self.assertEqual(spec_class.objects.count(), rows)
+
+    def test_spec_is_only_used_when_loaded_with_the_component(self):
+        refresh_specs("cpu")
+        CpuSpec.objects.filter(cpu_id=1).update(power_draw=999)
+        cpu = Cpu.objects.get(id=1)
+        with self.assertNumQueries(0):
+            self.assertIsNone(_spec(cpu))
+            self.assertEqual(estimate_cpu_power(cpu), 65)
+        cpu = Cpu.objects.select_related("spec").get(id=1)
+        self.assertEqual(_spec(cpu).power_draw, 999)
+        self.assertEqual(estimate_cpu_power(cpu), 999)
+        # A component without a spec row is parsed.
+        CpuSpec.objects.all().delete()
+        cpu = Cpu.objects.select_related("spec").get(id=1)
+        self.assertIsNone(_spec(cpu))
+        self.assertEqual(estimate_cpu_power(cpu), 65)
+
+    def test_spec_rows_agree_with_parsing(self):
+        for category, checks in self.CHECKS.items():
+            refresh_specs(category)
+            model_class = SPEC_MAP[category][0]
+            parsed = {obj.id: obj for obj in model_class.objects.all()}
+            for obj in model_class.objects.select_related("spec"):
+                self.assertIsNotNone(_spec(obj))
+                for check in checks:
+                    with self.subTest(category=category, id=obj.id, check=check.__name__):
+                        self.assertEqual(check(obj), check(parsed[obj.id]))
@@ -1,10 +1,13 @@
+from django.conf import settings
 from django.urls import path
+from . import async_views
 from .views import (
     index,
     toggle_compatibility,
     list_components,
     add_to_build,
     show_build,
+    build_compatibility,
     component_detail,
     remove_from_build,
     export_build,
@@ -12,17 +15,24 @@ from .views import (
     ajax_search, 
     save_build_to_db, 
     my_builds,
-    delete_build
+    delete_build,
+    metrics,
 )
 
 app_name = "main"
 
+if settings.ASYNC_VIEWS:
+    list_components = async_views.list_components
+    component_detail = async_views.component_detail
+    ajax_search = async_views.ajax_search
+
 urlpatterns = [
     path("", index, name="index"),
     path("toggle_compatibility/", toggle_compatibility, name="toggle_compatibility"),
     path("category/<str:category>/", list_components, name="list_components"),
     path("add/<str:category>/<int:item_id>/", add_to_build, name="add_to_build"),
     path("show_build/", show_build, name="show_build"),
+    path("show_build/compatibility/", build_compatibility, name="build_compatibility"),
     path(
         "detail/<str:category>/<int:item_id>/",
         component_detail,
@@ -35,5 +45,6 @@ urlpatterns = [
     path('save_build_to_db/', save_build_to_db, name='save_build_to_db'),
     path('my_builds/', my_builds, name='my_builds'),
     path('delete_build/<int:build_id>/', delete_build, name='delete_build'),
+    path('metrics/', metrics, name='metrics'),
 
 ]
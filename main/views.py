@@ -1,27 +1,26 @@
+import hmac
 import json
 import urllib.parse
+from django.conf import settings
+from django.core.paginator import Paginator
 from django.shortcuts import render, redirect, reverse, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseBadRequest, HttpResponse, JsonResponse
-from .models import (
-    Cpu,
-    Motherboard,
-    Memory,
-    Case,
-    CpuCooler,
-    InternalHardDrive,
-    Os,
-    VideoCard,
-    PowerSupply,
-)
-from .compatibility import (
-    filter_compatible_motherboards,
-    filter_compatible_cases_by_motherboard,
-    filter_compatible_psu,
-)
+from django.http import HttpResponseBadRequest, HttpResponse, HttpResponseForbidden, JsonResponse
+from .compatibility import filter_compatible_candidates_qs
+from .conditional import catalog_conditional
+from .build import BUILD_CATEGORIES, BUILD_MAP, BuildContext
+from .catalog import CATEGORY_MODELS, catalog
+from .columnar import candidate_ids
+from .delta import slot_change_delta
+from .fragments import list_fragment_parts
+from .metrics import render_prometheus
+from .report import compatibility_report
+from .responses import FastJsonResponse
+from .records import component_records
+from .pagination import InvalidCursor, keyset_page_from_request, page_size_from_request
+from .search import cached_search
 from accounts.models import SavedBuild
 
-
 def index(request):
     compatibility_on = request.session.get("compatibility_on", True)
     return render(request, "main/index.html", {"compatibility_on": compatibility_on})
@@ -33,54 +32,45 @@ def toggle_compatibility(request):
     return redirect("main:index")
 
 
+@catalog_conditional(uses_build=True)
 def list_components(request, category):
     compatibility_on = request.session.get("compatibility_on", True)
 
-    selected_cpu_id = request.session.get("build_cpu")
-    selected_motherboard_id = request.session.get("build_motherboard")
-    selected_os_id = request.session.get("build_os")
-
-    current_cpu = Cpu.objects.filter(id=selected_cpu_id).first() if selected_cpu_id else None
-    current_motherboard = Motherboard.objects.filter(id=selected_motherboard_id).first() if selected_motherboard_id else None
-    current_os = Os.objects.filter(id=selected_os_id).first() if selected_os_id else None
-
-    model_map = {
-        "cpu": Cpu,
-        "motherboard": Motherboard,
-        "memory": Memory,
-        "case": Case,
-        "cpu_cooler": CpuCooler,
-        "hdd": InternalHardDrive,
-        "os": Os,
-        "video_card": VideoCard,
-        "powersupply": PowerSupply,
-    }
-    model_class = model_map.get(category)
+    build = BuildContext.for_request(request)
+
+    model_class = CATEGORY_MODELS.get(category)
     if not model_class:
         return HttpResponseBadRequest("Некорректная категория")
 
-    items = model_class.objects.all()
+    items = component_records(model_class.objects.all(), category)
 
+    ids = None
     if compatibility_on:
-        if category == "motherboard" and current_cpu:
-            items = filter_compatible_motherboards(current_cpu, items)
-        elif category == "case" and current_motherboard:
-            items = filter_compatible_cases_by_motherboard(current_motherboard, items)
-        elif category == "powersupply":
-            items = filter_compatible_psu(
-                items,
-                cpu=current_cpu,
-                gpu=VideoCard.objects.filter(id=request.session.get("build_video_card")).first(),
-                memory=Memory.objects.filter(id=request.session.get("build_memory")).first(),
-                hdd=InternalHardDrive.objects.filter(id=request.session.get("build_hdd")).first(),
-            )
+        items = filter_compatible_candidates_qs(category, items, build)
+        ids = candidate_ids(category, build)
 
-    context = {
+    try:
+        items, next_cursor = keyset_page_from_request(request, items, ids)
+    except InvalidCursor:
+        return HttpResponseBadRequest("Некорректный курсор")
+
+    context = _category_list_context(request, category, items, compatibility_on, next_cursor, build)
+    return render(request, "main/category_list.html", context)
+
+
+def _category_list_context(request, category, items, compatibility_on, next_cursor, build):
+    return {
         "category": category,
         "items": items,
         "compatibility_on": compatibility_on,
+        "next_cursor": next_cursor,
+        "sort": request.GET.get("sort", "id"),
+        "fragment_key": list_fragment_parts(request, category, compatibility_on, build),
     }
-    return render(request, "main/category_list.html", context)
+
+
+def _wants_json(request):
+    return "application/json" in request.headers.get("Accept", "")
 
 
 @login_required
@@ -100,62 +90,33 @@ def add_to_build(request, category, item_id):
     if not key:
         return HttpResponseBadRequest("Некорректная категория")
 
-    model_map = {
-        "cpu": Cpu,
-        "motherboard": Motherboard,
-        "memory": Memory,
-        "case": Case,
-        "cpu_cooler": CpuCooler,
-        "hdd": InternalHardDrive,
-        "os": Os,
-        "video_card": VideoCard,
-        "powersupply": PowerSupply,
-    }
-    model_class = model_map.get(category)
-    try:
-        model_class.objects.get(id=item_id)
-    except model_class.DoesNotExist:
+    obj = catalog.get(category, item_id)
+    if obj is None:
         return HttpResponseBadRequest("Такого объекта не существует")
 
+    delta = None
+    if _wants_json(request):
+        build = BuildContext.for_request(request)
+        delta = slot_change_delta(request.session, build.components, category, obj)
+
     request.session[key] = item_id
     request.session.modified = True
+    BuildContext.invalidate(request)
+    if delta is not None:
+        return JsonResponse(delta)
     return redirect("main:show_build")
 
 
 @login_required
 def show_build(request):
-    build_cpu_id = request.session.get("build_cpu")
-    build_motherboard_id = request.session.get("build_motherboard")
-    build_memory_id = request.session.get("build_memory")
-    build_case_id = request.session.get("build_case")
-    build_cpu_cooler_id = request.session.get("build_cpu_cooler")
-    build_hdd_id = request.session.get("build_hdd")
-    build_os_id = request.session.get("build_os")
-    build_video_card_id = request.session.get("build_video_card")
-    build_powersupply_id = request.session.get("build_powersupply")
-
-    selected_cpu = Cpu.objects.filter(id=build_cpu_id).first() if build_cpu_id else None
-    selected_motherboard = Motherboard.objects.filter(id=build_motherboard_id).first() if build_motherboard_id else None
-    selected_memory = Memory.objects.filter(id=build_memory_id).first() if build_memory_id else None
-    selected_case = Case.objects.filter(id=build_case_id).first() if build_case_id else None
-    selected_cpu_cooler = CpuCooler.objects.filter(id=build_cpu_cooler_id).first() if build_cpu_cooler_id else None
-    selected_hdd = InternalHardDrive.objects.filter(id=build_hdd_id).first() if build_hdd_id else None
-    selected_os = Os.objects.filter(id=build_os_id).first() if build_os_id else None
-    selected_video_card = VideoCard.objects.filter(id=build_video_card_id).first() if build_video_card_id else None
-    sellected_powersupply = PowerSupply.objects.filter(id=build_powersupply_id).first() if build_powersupply_id else None
+    build = BuildContext.for_request(request)
+    return render(request, "main/build.html", dict(build.items()))
 
-    context = {
-        "cpu": selected_cpu,
-        "motherboard": selected_motherboard,
-        "memory": selected_memory,
-        "case": selected_case,
-        "cpu_cooler": selected_cpu_cooler,
-        "hdd": selected_hdd,
-        "os": selected_os,
-        "video_card": selected_video_card,
-        "powersupply": sellected_powersupply,
-    }
-    return render(request, "main/build.html", context)
+
+@login_required
+def build_compatibility(request):
+    report = compatibility_report(BuildContext.for_request(request))
+    return JsonResponse(report)
 
 
 def remove_from_build(request, category):
@@ -174,32 +135,21 @@ def remove_from_build(request, category):
     if not key:
         return HttpResponseBadRequest("Некорректная категория")
 
+    delta = None
+    if _wants_json(request):
+        build = BuildContext.for_request(request)
+        delta = slot_change_delta(request.session, build.components, category, None)
+
     if key in request.session:
         del request.session[key]
         request.session.modified = True
+    BuildContext.invalidate(request)
+    if delta is not None:
+        return JsonResponse(delta)
     return redirect("main:show_build")
 
 
-def component_detail(request, category, item_id):
-    model_map = {
-        "cpu": Cpu,
-        "motherboard": Motherboard,
-        "memory": Memory,
-        "case": Case,
-        "cpu_cooler": CpuCooler,
-        "hdd": InternalHardDrive,
-        "os": Os,
-        "video_card": VideoCard,
-        "powersupply": PowerSupply,
-    }
-    model_class = model_map.get(category)
-    if not model_class:
-        return HttpResponseBadRequest("Некорректная категория")
-
-    obj = model_class.objects.filter(id=item_id).first()
-    if not obj:
-        return HttpResponseBadRequest("Объект не найден")
-
+def _detail_context(category, obj):
     base_dns_url = "https://www.dns-shop.ru/search/"
     base_yandex_url = "https://market.yandex.ru/search?text="
     product_name = obj.name.strip() if obj.name else ""
@@ -212,35 +162,32 @@ def component_detail(request, category, item_id):
         "dns_link": dns_link,
         "yandex_link": yandex_link,
     }
-    return render(request, "main/detail.html", context)
+    return context
 
 
-BUILD_MAP = {
-    "build_cpu": (Cpu, "cpu"),
-    "build_motherboard": (Motherboard, "motherboard"),
-    "build_memory": (Memory, "memory"),
-    "build_case": (Case, "case"),
-    "build_cpu_cooler": (CpuCooler, "cpu_cooler"),
-    "build_hdd": (InternalHardDrive, "hdd"),
-    "build_os": (Os, "os"),
-    "build_video_card": (VideoCard, "video_card"),
-    "build_powersupply": (PowerSupply, "powersupply"),
-}
+@catalog_conditional()
+def component_detail(request, category, item_id):
+    if category not in CATEGORY_MODELS:
+        return HttpResponseBadRequest("Некорректная категория")
+
+    obj = catalog.get(category, item_id)
+    if not obj:
+        return HttpResponseBadRequest("Объект не найден")
+
+    context = _detail_context(category, obj)
+    return render(request, "main/detail.html", context)
 
 
 @login_required
 def export_build(request):
     build_data = {}
 
-    for session_key, (ModelClass, cat_name) in BUILD_MAP.items():
-        item_id = request.session.get(session_key)
-        if item_id:
-            obj = ModelClass.objects.filter(id=item_id).first()
-            if obj:
-                build_data[cat_name] = {
-                    "id": obj.id,
-                    "name": obj.name,
-                }
+    for cat_name, obj in BuildContext.for_request(request).items():
+        if obj:
+            build_data[cat_name] = {
+                "id": obj.id,
+                "name": obj.name,
+            }
 
     json_data = json.dumps(build_data, ensure_ascii=False, indent=2)
 
@@ -280,7 +227,7 @@ def import_build(request):
             if session_key_to_set and model_class:
                 item_id = obj_info.get("id")
                 if item_id:
-                    exists = model_class.objects.filter(id=item_id).exists()
+                    exists = catalog.get(map_cat, item_id) is not None
                     if exists:
                         request.session[session_key_to_set] = item_id
 
@@ -290,50 +237,7 @@ def import_build(request):
         return redirect("main:show_build")
 
 
-@login_required
-def ajax_search(request, category):
-    compatibility_on = request.session.get("compatibility_on", True)
-    query = request.GET.get("q", "").strip().lower()
-
-    selected_cpu_id = request.session.get("build_cpu")
-    selected_motherboard_id = request.session.get("build_motherboard")
-
-    current_cpu = Cpu.objects.filter(id=selected_cpu_id).first() if selected_cpu_id else None
-    current_motherboard = Motherboard.objects.filter(id=selected_motherboard_id).first() if selected_motherboard_id else None
-
-    model_map = {
-        "cpu": Cpu,
-        "motherboard": Motherboard,
-        "memory": Memory,
-        "case": Case,
-        "cpu_cooler": CpuCooler,
-        "hdd": InternalHardDrive,
-        "os": Os,
-        "video_card": VideoCard,
-        "powersupply": PowerSupply,
-    }
-    model_class = model_map.get(category)
-    if not model_class:
-        return JsonResponse({"error": "Некорректная категория"}, status=400)
-
-    items = model_class.objects.all()
-    if query:
-        items = items.filter(name__icontains=query)
-
-    if compatibility_on:
-        if category == "motherboard" and current_cpu:
-            items = filter_compatible_motherboards(current_cpu, items)
-        elif category == "case" and current_motherboard:
-            items = filter_compatible_cases_by_motherboard(current_motherboard, items)
-        elif category == "powersupply":
-            items = filter_compatible_psu(
-                items,
-                cpu=current_cpu,
-                gpu=VideoCard.objects.filter(id=request.session.get("build_video_card")).first(),
-                memory=Memory.objects.filter(id=request.session.get("build_memory")).first(),
-                hdd=InternalHardDrive.objects.filter(id=request.session.get("build_hdd")).first(),
-            )
-
+def _search_results(request, category, items):
     results = []
     for item in items:
         results.append({
@@ -346,8 +250,61 @@ def ajax_search(request, category):
                 reverse("main:add_to_build", args=[category, item.id])
             ),
         })
+    return results
+
+
+# Stands in for the item id when reversing URL templates for compact results.
+_ID_PLACEHOLDER = 2147483647
+
+
+def _url_templates(category):
+    return {
+        name: reverse(f"main:{name}", args=[category, _ID_PLACEHOLDER]).replace(str(_ID_PLACEHOLDER), "{id}")
+        for name in ("component_detail", "add_to_build")
+    }
 
-    return JsonResponse({"items": results}, safe=False)
+
+def _search_response(request, category, items, next_cursor):
+    # ?format=compact: [id, name] pairs plus one URL template per action,
+    # which the client expands itself.
+    if request.GET.get("format") == "compact":
+        return FastJsonResponse({
+            "items": [[item.id, item.name] for item in items],
+            "next": next_cursor,
+            "urls": _url_templates(category),
+        })
+    return FastJsonResponse({"items": _search_results(request, category, items), "next": next_cursor})
+
+
+@login_required
+def ajax_search(request, category):
+    compatibility_on = request.session.get("compatibility_on", True)
+    query = request.GET.get("q", "").strip().lower()
+
+    build = BuildContext.for_request(request)
+
+    model_class = CATEGORY_MODELS.get(category)
+    if not model_class:
+        return JsonResponse({"error": "Некорректная категория"}, status=400)
+
+    if query:
+        # Search results are one capped page of the best matches (at most
+        # ?size=, itself capped by CATALOG_MAX_PAGE_SIZE), never paginated:
+        # "next" is always null and ?after= is ignored.
+        items = cached_search(category, query, page_size_from_request(request), compatibility_on, build)
+        next_cursor = None
+    else:
+        items = component_records(model_class.objects.all(), category)
+        ids = None
+        if compatibility_on:
+            items = filter_compatible_candidates_qs(category, items, build)
+            ids = candidate_ids(category, build)
+        try:
+            items, next_cursor = keyset_page_from_request(request, items, ids)
+        except InvalidCursor:
+            return JsonResponse({"error": "Некорректный курсор"}, status=400)
+
+    return _search_response(request, category, items, next_cursor)
 
 
 
@@ -355,40 +312,14 @@ def ajax_search(request, category):
 def save_build_to_db(request):
     from accounts.models import SavedBuild
 
-    build_cpu_id = request.session.get("build_cpu")
-    build_motherboard_id = request.session.get("build_motherboard")
-    build_memory_id = request.session.get("build_memory")
-    build_case_id = request.session.get("build_case")
-    build_cpu_cooler_id = request.session.get("build_cpu_cooler")
-    build_hdd_id = request.session.get("build_hdd")
-    build_os_id = request.session.get("build_os")
-    build_video_card_id = request.session.get("build_video_card")
-    build_powersupply_id = request.session.get("build_powersupply")
-
-    cpu_obj = Cpu.objects.filter(id=build_cpu_id).first() if build_cpu_id else None
-    mb_obj = Motherboard.objects.filter(id=build_motherboard_id).first() if build_motherboard_id else None
-    mem_obj = Memory.objects.filter(id=build_memory_id).first() if build_memory_id else None
-    case_obj = Case.objects.filter(id=build_case_id).first() if build_case_id else None
-    cooler_obj = CpuCooler.objects.filter(id=build_cpu_cooler_id).first() if build_cpu_cooler_id else None
-    hdd_obj = InternalHardDrive.objects.filter(id=build_hdd_id).first() if build_hdd_id else None
-    os_obj = Os.objects.filter(id=build_os_id).first() if build_os_id else None
-    vc_obj = VideoCard.objects.filter(id=build_video_card_id).first() if build_video_card_id else None
-    ps_obj = PowerSupply.objects.filter(id=build_powersupply_id).first() if build_powersupply_id else None
+    build = BuildContext.for_request(request)
 
     build_name = "Моя сборка"
 
     SavedBuild.objects.create(
         user=request.user,
         build_name=build_name,
-        cpu=cpu_obj,
-        motherboard=mb_obj,
-        memory=mem_obj,
-        case=case_obj,
-        cpu_cooler=cooler_obj,
-        hdd=hdd_obj,
-        os=os_obj,
-        video_card=vc_obj,
-        powersupply=ps_obj
+        **build.components,
     )
     return redirect("main:my_builds")
 
@@ -397,8 +328,19 @@ def save_build_to_db(request):
 def my_builds(request):
     from accounts.models import SavedBuild
 
-    builds = SavedBuild.objects.filter(user=request.user).order_by("-created_at")
-    return render(request, "main/my_builds.html", {"builds": builds})
+    # SavedBuild foreign keys are named after the build categories.
+    builds = (
+        SavedBuild.objects.filter(user=request.user)
+        .select_related(*BUILD_CATEGORIES)
+        .only(
+            "id", "build_name", "created_at",
+            *(f"{field}__name" for field in BUILD_CATEGORIES),
+        )
+        .order_by("-created_at", "-id")
+    )
+    paginator = Paginator(builds, settings.MY_BUILDS_PAGE_SIZE)
+    page = paginator.get_page(request.GET.get("page"))
+    return render(request, "main/my_builds.html", {"builds": page, "page": page})
 
 
 @login_required
@@ -411,3 +353,19 @@ def delete_build(request, build_id):
 
     build.delete()
     return redirect("main:my_builds")
+
+
+def _may_scrape(request):
+    # Checked cheapest first: the scraper's address, its token, then staff.
+    if request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS:
+        return True
+    token = settings.METRICS_TOKEN
+    if token and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return True
+    return request.user.is_staff
+
+
+def metrics(request):
+    if not _may_scrape(request):
+        return HttpResponseForbidden("Нет доступа")
+    return HttpResponse(render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
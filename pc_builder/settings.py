@@ -21,10 +21,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.middleware.PerformanceMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'main.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -33,7 +35,7 @@ ROOT_URLCONF = 'pc_builder.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'main.template_backends.InstrumentedDjangoTemplates',
         'DIRS': [
         ],
         'APP_DIRS': True,
@@ -43,6 +45,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'main.context_processors.build',
             ],
         },
     },
@@ -61,6 +64,43 @@ DATABASES = {
     }
 }
 
+# Local stand-in for running tests and benchmarks without a PostgreSQL server,
+# e.g. PC_BUILDER_SQLITE=db.sqlite3 python manage.py run_benchmarks
+if os.environ.get('PC_BUILDER_SQLITE'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ['PC_BUILDER_SQLITE'],
+        }
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # ajax_search results; entries also expire when the catalog version moves.
+    'search': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'search',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    # Rendered category_list item lists, see main/fragments.py.
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragments',
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+    # One counter per category for evict_fragments(category); never expires
+    # and is never culled, unlike the fragments themselves.
+    'fragment_generations': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragment-generations',
+        'TIMEOUT': None,
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -79,3 +119,38 @@ STATICFILES_DIRS = [
 ]
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+CATALOG_PAGE_SIZE = 50
+CATALOG_MAX_PAGE_SIZE = 200
+CATALOG_VERSION_CHECK_INTERVAL = 5
+# Cache-Control max-age for catalog pages that do not depend on the session.
+CATALOG_HTTP_MAX_AGE = 60
+# Mixed into catalog ETags so a deploy retires them; defaults to the git
+# commit of the checkout when empty.
+CATALOG_ETAG_SALT = os.environ.get('PC_BUILDER_RELEASE', '')
+# Memory-mapped columnar copy of the catalog shared by all workers.
+COLUMNAR_CATALOG_DIR = BASE_DIR / 'columnar'
+MY_BUILDS_PAGE_SIZE = 20
+COMPATIBILITY_REPORT_CACHE_SIZE = 1024
+# Set by pc_builder/asgi.py: serve the catalog views from main/async_views.py.
+ASYNC_VIEWS = os.environ.get('PC_BUILDER_ASYNC_VIEWS') == '1'
+
+# Who may read /metrics/ besides staff users: these client addresses
+# (REMOTE_ADDR, so list the proxy when behind one) or "Authorization:
+# Bearer <token>" when a token is set.
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_TOKEN = os.environ.get('PC_BUILDER_METRICS_TOKEN', '')
+
+PROFILE_DIR = BASE_DIR / 'profiles'
+PROFILE_MAX_FILES = 50
+PROFILE_SAMPLE_INTERVAL = 0.001
+
+QUERY_LOG_DIR = BASE_DIR / 'querylog'
+QUERY_LOG_FLUSH_INTERVAL = 10
+QUERY_LOG_SAMPLES = 1000
+SLOW_QUERY_THRESHOLD_MS = 100
+# Share of new slowest examples EXPLAINed, by a background thread per process.
+SLOW_QUERY_EXPLAIN_RATE = 0.1
+
+# Keeps the query logs, profiles and columnar files of test runs out of BASE_DIR.
+TEST_RUNNER = 'main.test_runner.ScratchDirRunner'